@@ -1,13 +1,18 @@
 import streamlit as st
-import pandas as pd
-import requests
-import io
+import os
 import warnings
-import re
-import unicodedata  # これが抜けていました！
-import urllib.parse
-from datetime import datetime, timedelta, timezone
+import time
 import streamlit.components.v1 as components
+from jbjjf_timetable.parser import filter_schedule, filter_schedule_multi
+from jbjjf_timetable.render import generate_full_html
+from jbjjf_timetable.snapshot import dojo_version
+from jbjjf_timetable.export import export_json_feeds, export_static_timetables
+from jbjjf_timetable.fetch import SnapshotRefresher, new_fetch_state
+from jbjjf_timetable.metrics import METRICS, start_metrics_writer
+from jbjjf_timetable.profiling import finish_rerun_profile, start_rerun_profile
+from jbjjf_timetable.search import (
+    build_dojo_search_index, build_player_index, group_dojos_by_initial, search_dojos, search_players,
+)
 
 warnings.filterwarnings('ignore')
 
@@ -17,655 +22,96 @@ st.set_page_config(
     page_icon="🥋",
     layout="wide"
 )
-
-# --- 帯色判定ロジック ---
-def get_belt_color(category_text):
-    text = str(category_text)
-    if "白帯" in text or "White" in text:
-        return "#e0e0e0" # 白
-    elif "青帯" in text or "Blue" in text:
-        return "#0055af" # 青
-    elif "紫帯" in text or "Purple" in text:
-        return "#6a0dad" # 紫
-    elif "茶帯" in text or "Brown" in text:
-        return "#654321" # 茶
-    elif "黒帯" in text or "Black" in text:
-        return "#333333" # 黒
-    elif "灰" in text or "Gray" in text:
-        return "#808080" # キッズ灰
-    elif "黄" in text or "Yellow" in text:
-        return "#ffd700" # キッズ黄
-    elif "橙" in text or "Orange" in text:
-        return "#ffa500" # キッズ橙
-    elif "緑" in text or "Green" in text:
-        return "#008000" # キッズ緑
-    else:
-        return "#ff4b4b" # デフォルト
+_rerun_started = time.perf_counter()
+
+# --- プロファイル ---
+# ?profile=<PROFILE_KEY> のときと、PROFILE_SAMPLE_RATE の確率に当たったときだけこの再実行を計測し、
+# PROFILE_DIR に cProfile の統計とフレームグラフ用のスタック集計を書き出す
+PROFILE_KEY = os.environ.get("PROFILE_KEY", "")
+start_rerun_profile(
+    "+".join(st.query_params.get_all("dojo")) or "top",
+    forced=bool(PROFILE_KEY) and st.query_params.get("profile") == PROFILE_KEY,
+)
 
 # --- データ取得ロジック ---
-SPS_URL = "https://docs.google.com/spreadsheets/u/1/d/e/2PACX-1vQoIxREOSKT14WEJRKj3VuOXhodOxydJusm-c9BZD-d9idHwXQHeCkEJJd8HzxAyH6OoeMxn9UMne2a/pub?output=xlsx"
-
-@st.cache_data(ttl=60)
-def load_data_and_title():
-    try:
-        resp = requests.get(SPS_URL, verify=False, timeout=30)
-        
-        extracted_title = "JBJJF Tournament"
-        if "Content-Disposition" in resp.headers:
-            cd = resp.headers["Content-Disposition"]
-            matches = re.findall(r"filename\*=UTF-8''(.+)", cd)
-            if matches:
-                filename = urllib.parse.unquote(matches[0])
-            else:
-                matches_simple = re.findall(r'filename="(.+?)"', cd)
-                filename = matches_simple[0] if matches_simple else "JBJJF Tournament"
-            extracted_title = re.sub(r'\.xlsx$', '', filename, flags=re.IGNORECASE)
-
-        dfs = pd.read_excel(io.BytesIO(resp.content), sheet_name=None, header=None)
-        return dfs, extracted_title
-    except:
-        return None, "JBJJF Tournament"
-
-def clean_val(v): return re.sub(r'\.0$', '', str(v).strip())
-
-def is_valid_id(text):
-    text = clean_val(text)
-    if text in ["nan", "", "-", "No", "•", "Result"]: return False
-    if re.match(r'^\d+-\d+$', text): return True
-    if text.isdigit() and int(text) < 999: return True
-    return False
-
-def extract_time_from_line(line_txt):
-    times = re.findall(r'(\d{1,2}:\d{2})', line_txt)
-    return times[0] if times else "-"
-
-def has_time_pattern(text): return bool(re.search(r'\d{1,2}:\d{2}', str(text)))
-def has_time_nearby(df, r, c, rows, cols):
-    for dr in range(0, 4):
-        curr_r = r + dr; 
-        if curr_r >= rows: continue
-        for dc in range(-1, 3):
-            curr_c = c + dc; 
-            if 0 <= curr_c < cols:
-                val = str(df.iloc[curr_r, curr_c])
-                if has_time_pattern(val) or "集合" in val: return True
-    return False
-
-def collect_times_vertical_strip(df, id_row, id_col):
-    rows, cols = df.shape; found_times = []
-    target_cols = [id_col - 1, id_col - 2]
-    for c in target_cols:
-        if c < 0: continue
-        for r in range(id_row, min(rows, id_row + 4)):
-            val = clean_val(df.iloc[r, c])
-            times = re.findall(r'(\d{1,2}:\d{2})', val)
-            for t in times: 
-                if t not in found_times: found_times.append(t)
-        if len(found_times) >= 1: break
-    found_times.sort()
-    t_s = found_times[0] if len(found_times) >= 1 else "-"
-    t_k = found_times[1] if len(found_times) >= 2 else "-"
-    t_b = found_times[2] if len(found_times) >= 3 else "-"
-    return t_s, t_k, t_b
-
-def extract_all_dojos(sheets):
-    dojo_set = set()
-    
-    def has_japanese(text):
-        return bool(re.search(r'[一-龥ぁ-んァ-ン]', text))
-    
-    def has_alpha(text):
-        return bool(re.search(r'[a-zA-Z]', text))
-        
-    def is_likely_player(text):
-        # Pattern 1: 日本語＋英語混在 (e.g. "松本将樹 Masaki Matsumoto")
-        if has_japanese(text) and has_alpha(text):
-            return bool(re.search(r'[一-龥ぁ-んァ-ン]+[ \u3000]+[a-zA-Z]', text))
-        # Pattern 2: 純英語の選手名 (e.g. "Jungwoo Lee", "Pedro Iamashita")
-        #   - 2〜4語の英字のみ単語
-        #   - タイトルケース（全大文字ではない）
-        #   - BJJ系キーワードやハイフンを含まない
-        if has_alpha(text) and not has_japanese(text):
-            BJJ_WORDS = {"GYM", "JIU", "JITSU", "JIUJITSU", "ACADEMY", "CLUB",
-                         "TEAM", "DIEM", "CARPE", "BOA", "SORTE", "FORCE",
-                         "TRIANGLE", "ALLIANCE", "GRACIE", "MMA", "BJJ",
-                         "ESCUDO", "IMPACTO", "SISU", "SEISHINKAN"}
-            words = text.split()
-            if 2 <= len(words) <= 4:
-                valid = True
-                for w in words:
-                    if not re.match(r'^[A-Za-z]+$', w):  # ハイフン等を含む→道場名
-                        valid = False; break
-                    if w == w.upper() and len(w) > 2:    # 全大文字→略称/組織名
-                        valid = False; break
-                    if not w[0].isupper():                # 先頭大文字でない
-                        valid = False; break
-                    if w.upper() in BJJ_WORDS:
-                        valid = False; break
-                if valid:
-                    return True
-        return False
-
-
-    def is_likely_dojo(text):
-        # Dojos are usually either all Alpha (SCORPION GYM) or all Japanese (ねわざワールド)
-        # They rarely mix scripts in the same way, or at least we can assume if it's NOT a player format, it might be a dojo.
-        # Also exclude common keywords
-        if text in ["集合時間", "計量", "試合開始", "Result", "優勝", "Winner", "カテゴリー", "Mat", "マット", "道着チェック", "欠場"]: return False
-        
-        # Exclude if it looks like a player name (Japanese Space English)
-        if is_likely_player(text): return False
-        return True
-
-    for _, df in sheets.items():
-        df = df.fillna("").astype(str)
-        rows, cols = df.shape
-        # Search more columns to ensure we catch dojos in later columns (e.g. col 5)
-        search_cols = min(20, cols)
-        
-        for r in range(1, rows):
-            for c in range(search_cols):
-                val = clean_val(df.iloc[r, c])
-                
-                # Basic validation
-                if len(val) < 2 or is_valid_id(val) or has_time_pattern(val): continue
-                if not is_likely_dojo(val): continue
-                
-                # Context check: Look at the row above (r-1)
-                upper_val = clean_val(df.iloc[r-1, c])
-                
-                # Heuristic: If row above is a Player, this row is likely a Dojo
-                if is_likely_player(upper_val):
-                     dojo_set.add(val)
-
-    if not dojo_set:
-        # Fallback: if strict logic finds nothing, try looser logic (e.g. just row-1 is not category)
-        # But for now, returning empty is better than garbage.
-        # Let's add at least one check to avoid complete empty if possible.
-        pass
-
-    def _sort_key(name):
-        # 先頭文字がASCII範囲外（日本語等）なら後ろのグループへ
-        is_jp = ord(name[0]) > 127 if name else True
-        return (is_jp, name.lower())
-
-    return sorted(list(dojo_set), key=_sort_key)
+@st.cache_resource
+def get_fetch_state():
+    """条件付き取得の状態 (プロセス全体で1つ)"""
+    return new_fetch_state()
 
-def get_schedule_data(sheets, target_dojo):
-    results = []
-    for sheet_name, df in sheets.items():
-        df = df.fillna("").astype(str)
-        rows, cols = df.shape
-        search_cols = min(20, cols) # Increase search width here too
-        normalized_sheet = unicodedata.normalize('NFKC', str(sheet_name))
-        mat_match = re.search(r'(\d+)', normalized_sheet)
-        mat_num = mat_match.group(1) if mat_match else "999"
+@st.cache_resource(show_spinner=False)
+def get_refresher():
+    return SnapshotRefresher(get_fetch_state(), on_publish=publish_snapshot).start()
 
-        for r in range(rows):
-            for c in range(search_cols):
-                val = clean_val(df.iloc[r, c])
-                if val == target_dojo:
-                    if r > 0:
-                        player_name = clean_val(df.iloc[r-1, c])
-                        if player_name and player_name != "nan" and target_dojo not in player_name and len(player_name) >= 2:
-                            # 選手名として無効なキーワードはスキップ
-                            INVALID_PLAYER_NAMES = {
-                                "優勝", "準優勝", "3位", "試合開始", "欠場",
-                                "道着チェック", "集合時間", "計量", "Result",
-                                "Winner", "1回戦の敗者", "2回戦の敗者"
-                            }
-                            if player_name in INVALID_PLAYER_NAMES:
-                                continue
-                            # プレイヤー行に「計量」「集合」が含まれている場合は、試合行ではなくスケジュール行なのでスキップ
-                            player_row_str = " ".join([clean_val(x) for x in df.iloc[r-1, :].tolist()])
-                            if "計量" in player_row_str or "集合" in player_row_str:
-                                continue
-
-                            # Phase 1
-                            scan_range_1 = range(-3, 3); max_search_col_1 = min(c + 10, cols)
-                            barrier_col = -1; barrier_row = -1; found_time_signal = False
-                            for offset in scan_range_1:
-                                curr = r + offset
-                                if 0 <= curr < rows:
-                                    for check_c in range(c, max_search_col_1):
-                                        cell_val = clean_val(df.iloc[curr, check_c])
-                                        if "集合" in cell_val or has_time_pattern(cell_val):
-                                            if barrier_col == -1 or check_c < barrier_col:
-                                                barrier_col = check_c; barrier_row = curr
-                                            found_time_signal = True
-                            match_id = "-"; is_second_round = False; base_row_for_time = r
-                            if found_time_signal:
-                                found_ids = []
-                                for offset in scan_range_1:
-                                    curr = r + offset
-                                    if 0 <= curr < rows:
-                                        for sc in range(c + 1, max_search_col_1):
-                                            if barrier_col != -1 and sc < barrier_col: continue
-                                            v = df.iloc[curr, sc]
-                                            if is_valid_id(v):
-                                                dist_base = r if barrier_row == -1 else barrier_row
-                                                dist = abs(curr - dist_base)
-                                                found_ids.append((dist, clean_val(v), curr, sc))
-                                if found_ids:
-                                    found_ids.sort(key=lambda x: x[0])
-                                    match_id = found_ids[0][1]
-                                    base_row_for_time = barrier_row if barrier_row != -1 else found_ids[0][2]
-                            t_s, t_k, t_b = "-", "-", "-"
-                            if match_id != "-":
-                                time_anchor = -1
-                                for offset in range(-2, 3):
-                                    curr = base_row_for_time + offset
-                                    if 0 <= curr < rows:
-                                        if "集合" in " ".join(df.iloc[curr].astype(str)):
-                                            time_anchor = curr; break
-                                target_r = time_anchor if time_anchor != -1 else base_row_for_time
-                                if target_r < rows: t_s = extract_time_from_line(" ".join([clean_val(x) for x in df.iloc[target_r, :].tolist()]))
-                                if target_r + 1 < rows: t_k = extract_time_from_line(" ".join([clean_val(x) for x in df.iloc[target_r + 1, :].tolist()]))
-                                if target_r + 2 < rows: t_b = extract_time_from_line(" ".join([clean_val(x) for x in df.iloc[target_r + 2, :].tolist()]))
-                            # Phase 2
-                            if match_id == "-":
-                                scan_range_2 = range(-8, 9); start_col_2 = c + 1; max_search_col_2 = min(c + 25, cols)
-                                found_ids_2 = []
-                                for offset in scan_range_2:
-                                    curr = r + offset
-                                    if 0 <= curr < rows:
-                                        for sc in range(start_col_2, max_search_col_2):
-                                            v = df.iloc[curr, sc]
-                                            if is_valid_id(v):
-                                                if has_time_nearby(df, curr, sc, rows, cols):
-                                                    row_dist = abs(curr - r); col_dist = sc
-                                                    score = (row_dist * 1000) + col_dist
-                                                    found_ids_2.append((score, clean_val(v), curr, sc))
-                                if found_ids_2:
-                                    found_ids_2.sort(key=lambda x: x[0])
-                                    match_id = found_ids_2[0][1]
-                                    id_row = found_ids_2[0][2]; id_col = found_ids_2[0][3]
-                                    is_second_round = True
-                                    t_s, t_k, t_b = collect_times_vertical_strip(df, id_row, id_col)
-                            category = "不明"
-                            for up in range(1, 300):
-                                if r - up < 0: break
-                                line_vals = [str(v).strip() for v in df.iloc[r-up, :]]
-                                if any(k in " ".join(line_vals) for k in ["帯", "Weight", "Category"]):
-                                    cands = [v for v in line_vals if len(v)>4]; 
-                                    if cands: category = cands[0]; break
-                            results.append({
-                                "mat": mat_num, "name": player_name, "match_no": match_id,
-                                "is_seed": is_second_round, "start_time": t_b, "category": category
-                            })
-                            break
-    df_res = pd.DataFrame(results)
-    if not df_res.empty:
-        # 重複削除 (念のため mat, match_no, name, start_time で判定)
-        df_res = df_res.drop_duplicates(subset=['mat', 'match_no', 'name', 'start_time'])
-    return df_res
+def load_data_and_title():
+    """現在の Snapshot を返す (Snapshot はプロセス内で共有するので読み取り専用として扱うこと)"""
+    return get_refresher().current()
+
+# --- 計測 ---
+# METRICS_FILE を指定すると各段階の計測値を Prometheus のテキスト形式で定期的に書き出す
+# (static/ の下に置けば /app/static/ で取得できる。例: METRICS_FILE=static/metrics.txt)
+# METRICS_DEBUG_KEY を指定すると ?debug=<キー> のときだけ画面の下に計測パネルを出す
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+METRICS_DEBUG_KEY = os.environ.get("METRICS_DEBUG_KEY", "")
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_writer():
+    return start_metrics_writer(os.path.join(os.path.dirname(os.path.abspath(__file__)), METRICS_FILE))
+
+def show_metrics_panel():
+    stages, caches, ages = METRICS.summary()
+    with st.expander("計測 (デバッグ)", expanded=True):
+        st.caption(" / ".join(f"{name}: {age:.0f}秒前" for name, age in ages.items()) or "版の記録なし")
+        st.dataframe(stages, hide_index=True, width="stretch")
+        st.dataframe(caches, hide_index=True, width="stretch")
+
+if METRICS_FILE:
+    get_metrics_writer()
 
 # --- HTML生成 ---
-# --- HTML生成 ---
-def generate_full_html(df):
-    if df.empty:
-        return "<div style='padding:20px; text-align:center;'>No matches found.</div>"
-    
-    def time_to_min(t_str):
-        try: h, m = map(int, t_str.split(':')); return h * 60 + m
-        except: return None
-    df['min_time'] = df['start_time'].apply(time_to_min)
-    df_valid = df.dropna(subset=['min_time']).copy()
-    if df_valid.empty: return "<div style='padding:20px; text-align:center;'>No valid match times found.</div>"
-
-    min_t = int(df_valid['min_time'].min()) - 30
-    max_t = int(df_valid['min_time'].max()) + 60
-    PX_PER_MIN = 2.2 
-    CARD_HEIGHT = 42 # カードの高さを圧縮
-    
-    # デザイン定義
-    css = f"""
-    <style>
-    /* 全体のフォントと背景 */
-    body {{
-        font-family: "Helvetica Neue", Arial, "Hiragino Kaku Gothic ProN", "Hiragino Sans", Meiryo, sans-serif;
-        margin: 0;
-        padding: 0;
-        background-color: #0e1117; 
-        color: #fafafa;
-    }}
-
-    /* タイムテーブル全体のラッパー */
-    .timetable-wrapper {{
-        display: flex;
-        flex-direction: row;
-        padding: 0;
-        background-color: #0e1117;
-        position: relative;
-        height: calc(100vh - 70px); /* ヘッダー分を引く */
-        overflow: auto;
-    }}
-
-    /* 左側の時間軸 */
-    .time-axis {{
-        width: 60px; /* 少し広げる */
-        flex-shrink: 0;
-        position: sticky; /* 横スクロール時に左端に固定 */
-        left: 0;
-        /* border-right: 1px solid #e0e0e0; */ /* 二重線になるので削除 */
-        margin-right: 4px; /* 時間ラベルと縦棒の間のスペース */
-        background: #0e1117;
-        z-index: 20; /* マット列の上に表示 */
-        margin-top: 40px; 
-    }}
-    .time-label {{
-        position: absolute;
-        width: 100%;
-        text-align: right;
-        padding-right: 2px;
-        font-size: 10px; /* 文字サイズ調整 */
-        color: #a0a0a0;
-        /* border-top: 1px solid #eee; */ /* 軸側の線は消す */
-        line-height: 1;
-        transform: translateY(-50%); 
-    }}
-
-    /* マットごとの列 */
-    .mat-column {{
-        width: 260px;
-        min-width: 260px;
-        flex-shrink: 0;
-        margin-right: 0; 
-        position: relative;
-        background-color: transparent;
-        display: flex;
-        flex-direction: column;
-        /* border-right: 1px solid #e0e0e0; */ /* ヘッダーの縦線削除のため削除 */
-    }}
-
-    /* マットヘッダー (スティッキー) */
-    .mat-header {{
-        text-align: center;
-        font-weight: bold;
-        padding: 0;
-        background-color: #0e1117; 
-        color: #fafafa;
-        position: sticky;
-        top: 0;
-        z-index: 40;
-        height: 40px;
-        line-height: 40px;
-        font-size: 14px;
-        /* box-shadow: 0 2px 4px rgba(0,0,0,0.1); シャドウ削除 */
-        border-bottom: 1px solid #414144; /* これが「緑の箇所の罫線」 */
-    }}
-
-    /* マット本体 (カード配置領域) */
-    .mat-body {{
-        position: relative;
-        background-color: #0e1117; 
-        margin-top: 0;
-        border-right: 1px solid #414144; /* ここに縦線を追加 */
-        flex-grow: 1;
-        /* グリッド線はdivで描画するため背景画像の指定は削除 */
-        background-image: none;
-    }}
-
-    /* グリッド線 */
-    .grid-line {{
-        position: absolute;
-        left: 0;
-        right: 0;
-        z-index: 1;
-        pointer-events: none;
-    }}
-    .grid-line-solid {{
-        border-top: 1px solid #414144;
-    }}
-    .grid-line-dashed {{
-        border-top: 1px dashed #414144;
-    }}
-
-    /* 試合カード */
-    .match-card {{
-        position: absolute;
-        background-color: #262730; /* ダークグレー */
-        border-radius: 2px; 
-        padding: 2px 6px;
-        box-shadow: none; /* シャドウなし */
-        overflow: hidden;
-        line-height: 1.1;
-        z-index: 10;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-        border-left-width: 4px;
-        border-left-style: solid;
-        box-sizing: border-box;
-        transition: transform 0.1s ease;
-        /* 枠線はつけないか、薄くつける */
-        /* border: 1px solid #eee; */
-    }}
-    .match-card:hover {{
-        transform: translateY(-1px);
-        z-index: 30;
-        background-color: #363945;
-    }}
-    .match-card.card-front {{
-        background-color: #363945;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.5);
-    }}
-
-    /* カード内のテキスト */
-    .card-time {{
-        color: #a0a0a0;
-        font-size: 10px; /* 小さく */
-        margin-bottom: 1px;
-    }}
-    .card-player {{
-        font-weight: bold;
-        font-size: 11px; /* 小さく */
-        color: #fafafa;
-        margin-bottom: 0px;
-        white-space: nowrap;
-        overflow: hidden;
-        text-overflow: ellipsis;
-    }}
-
-    /* 現在時刻ライン */
-    .current-time-line {{
-        position: absolute;
-        left: 0;
-        border-top: 2px solid #ff4b4b;
-        z-index: 999;
-        pointer-events: none;
-    }}
-    .current-time-badge {{
-        position: sticky;
-        left: 0;
-        background-color: #ff4b4b;
-        color: white;
-        padding: 2px 6px;
-        border-radius: 4px;
-        font-size: 12px;
-        font-weight: bold;
-        z-index: 1000;
-        transform: translateY(-50%);
-        display: inline-block;
-    }}
-    
-    /* Ensure clickability */
-    html, body {{
-        height: 100%;
-        margin: 0;
-        padding: 0;
-        background-color: transparent; /* Or match background */
-    }}
-    .timetable-wrapper {{
-        min-height: 100%;
-    }}
-    </style>
-    """
-
-    # mats を先に計算してコンテンツ幅を確定する
-    df_valid['mat_int'] = pd.to_numeric(df_valid['mat'], errors='coerce').fillna(999).astype(int)
-    mats = sorted(df_valid['mat_int'].unique())
-    TIME_AXIS_W = 60; MAT_MARGIN = 4; MAT_COL_W = 260
-    total_content_w = TIME_AXIS_W + MAT_MARGIN + len(mats) * MAT_COL_W
-
-    html_parts = [css, '<div class="timetable-wrapper">']
-    
-    jst_now = datetime.now(timezone.utc) + timedelta(hours=9)
-    current_min = jst_now.hour * 60 + jst_now.minute
-    
-    HEADER_HEIGHT = 40
-    if min_t <= current_min <= max_t:
-        line_top = (current_min - min_t) * PX_PER_MIN + HEADER_HEIGHT
-        time_str = jst_now.strftime('%H:%M')
-        html_parts.append(
-            f'<div class="current-time-line" style="top: {line_top}px; width: {total_content_w}px;">'
-            f'<div class="current-time-badge">{time_str}</div>'
-            f'</div>'
-        )
-    
-    html_parts.append(f'<div class="time-axis" style="height: {(max_t - min_t) * PX_PER_MIN}px;">')
-    current_t = min_t - (min_t % 30)
-    while current_t <= max_t:
-        top_px = (current_t - min_t) * PX_PER_MIN
-        if top_px >= 0:
-            h = current_t // 60; m = current_t % 60
-            # xx:00 のみ表示
-            if m == 0:
-                label_html = f'<div class="time-label" style="top: {top_px}px;">{h:02d}:{m:02d}</div>'
-                html_parts.append(label_html)
-        current_t += 30
-    html_parts.append('</div>')
-    
-    # グリッド線の位置とスタイルを計算
-    grid_lines_html = []
-    g_t = min_t - (min_t % 30)
-    while g_t <= max_t:
-        top_px = (g_t - min_t) * PX_PER_MIN
-        if top_px >= 0:
-            m = g_t % 60
-            style_class = "grid-line-solid" if m == 0 else "grid-line-dashed"
-            grid_lines_html.append(f'<div class="grid-line {style_class}" style="top: {top_px}px;"></div>')
-        g_t += 30
-    grid_lines_str = "".join(grid_lines_html)
+TIMETABLE_CACHE_SIZE = 256
+
+@st.cache_data(max_entries=TIMETABLE_CACHE_SIZE, show_spinner=False)
+def render_timetable_cached(versions, dojos, _df):
+    """(道場ごとの版のタプル, 道場のタプル) ごとに generate_full_html の結果を保持する (古いものから追い出す)。
+    他の道場の試合だけが変わった版では作り直さない"""
+    METRICS.mark_miss("timetable_html")
+    with METRICS.timer("generate_full_html"):
+        return generate_full_html(_df.copy(), dojos=list(dojos))
+
+# --- 静的書き出し ---
+# 版が変わるたびに道場ごとのタイムテーブルを静的 HTML として書き出す
+# (enableStaticServing により /app/static/timetable/ で配信され、Streamlit のスクリプト実行を通らない)
+STATIC_EXPORT = os.environ.get("STATIC_EXPORT", "1") != "0"
+STATIC_EXPORT_DIR = os.environ.get(
+    "STATIC_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "timetable")
+)
 
-    for i, m in enumerate(mats):
-        mat_label = f"マット{m}" if m != 999 else "Other"
-        df_mat = df_valid[df_valid['mat_int'] == m].sort_values('min_time')
-        
-        # mat-column自体のボーダーは削除
-        html_parts.append(f'<div class="mat-column">')
-        
-        html_parts.append(f'<div class="mat-header">{mat_label}</div>')
-        
-        # 最初のカラムだけ左ボーダーを mat-body に追加
-        extra_style = "border-left: 1px solid #e0e0e0;" if i == 0 else ""
-        html_parts.append(f'<div class="mat-body" style="min-height: {(max_t - min_t) * PX_PER_MIN}px; {extra_style}">')
-        
-        # グリッド線を追加
-        html_parts.append(grid_lines_str)
-        
-        # 重なり判定用のカラム終了位置 (pixel) を保持するリスト
-        # indexがカラム位置(0=左端, 1=一段右, 2=二段右...)、値はそのカラムの埋まっている最後尾(bottom_px)
-        col_ends = [] 
-        
-        for _, row in df_mat.iterrows():
-            start_min = row['min_time']
-            top_px = (start_min - min_t) * PX_PER_MIN
-            height_px = CARD_HEIGHT
-            bottom_px = top_px + height_px
-            
-            # 配置可能なカラムを探す
-            target_col = -1
-            for col_idx, end_px in enumerate(col_ends):
-                # 既存のカラムで、top_px が end_px より下なら配置可能
-                # 少し遊びを持たせるなら top_px >= end_px - tolerance
-                if top_px >= end_px:
-                    target_col = col_idx
-                    col_ends[col_idx] = bottom_px
-                    break
-            
-            # 空きがなければ新しいカラムを追加
-            if target_col == -1:
-                target_col = len(col_ends)
-                col_ends.append(bottom_px)
-            
-            # スタイル決定 (階層が深くなるほど右にずらす)
-            # 1階層あたり20%ずらす
-            indent_pct = target_col * 20
-            left_pct = 2 + indent_pct
-            
-            # 幅は画面からはみ出さないように調整、かつ狭くなりすぎないように
-            # 右端をある程度揃えたいが、後ろのカラムが見えなくなるので
-            # widthは 96 - indent_pct とする（右端揃え）
-            # あるいは少し残す？
-            width_pct = 96 - indent_pct
-            
-            if width_pct < 20: width_pct = 20 # 最低幅保証
-            
-            z_index = 10 + target_col # 後ろのカラム（右側）ほど手前に表示
-            
-            display_no = str(row['match_no']).split()[0]
-            cat_text = str(row["category"])
-            belt_color = get_belt_color(cat_text)
-            
-            card_html = (
-                f'<div class="match-card" data-base-z="{z_index}" onclick="bringToFront(this, event)" style="top: {top_px}px; height: {height_px}px; left: {left_pct}%; width: {width_pct}%; z-index: {z_index}; border-left-color: {belt_color};" >'
-                f'<div class="card-time">{row["start_time"]}</div>'
-                f'<div class="card-player">#{display_no} {row["name"]}</div>'
-                f'</div>'
-            )
-            html_parts.append(card_html)
-        html_parts.append('</div></div>')
-    html_parts.append('</div>')
-    
-    html_parts.append('</div>')
-    
-    # iframe内でのクリックを検知してサイドバーを閉じるスクリプトを追加
-    html_parts.append("""
-    <script>
-    // 前面に出す処理
-    function bringToFront(card, e) {
-        e.stopPropagation(); // バブリング防止（サイドバー閉じ処理と競合しないよう）
-        var body = card.closest('.mat-body');
-        if (!body) return;
-        var allCards = body.querySelectorAll('.match-card');
-        // 一度全カードをリセット
-        allCards.forEach(function(c) {
-            var baseZ = parseInt(c.getAttribute('data-base-z') || '10');
-            c.style.zIndex = baseZ;
-            c.classList.remove('card-front');
-        });
-        // クリックされたカードを最前面へ
-        card.style.zIndex = 999;
-        card.classList.add('card-front');
+# 道場ごとの <slug>.json と大会全体の tournament.json (書き出し方は jbjjf_timetable.export)
+STATIC_FEED_DIR = os.environ.get(
+    "STATIC_FEED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "feed")
+)
 
-        // サイドバーも閉じる
-        notifyParentToClose(e);
-    }
+def publish_snapshot(snapshot):
+    """新しい版を静的ファイルとして書き出す (更新スレッドから呼ばれる)"""
+    if snapshot.content_hash is None:
+        return
+    if STATIC_EXPORT:
+        export_static_timetables(snapshot, STATIC_EXPORT_DIR)
+        export_json_feeds(snapshot, STATIC_FEED_DIR)
 
-    function notifyParentToClose(e) {
-        if (window.parent && window.parent.closeStreamlitSidebar) {
-            window.parent.closeStreamlitSidebar();
-        }
-    }
+# --- 団体検索 ---
+# 検索キーは版ごとに1回だけ作り (jbjjf_timetable.search)、サイドバーには一致した団体だけを送る
+DOJO_GROUP_THRESHOLD = 30  # これより多いときは頭文字ごとに分けて表示する
 
-    // カード以外の場所クリックでリセット
-    document.addEventListener('click', function(e) {
-        if (!e.target.closest('.match-card')) {
-            document.querySelectorAll('.match-card').forEach(function(c) {
-                var baseZ = parseInt(c.getAttribute('data-base-z') || '10');
-                c.style.zIndex = baseZ;
-                c.classList.remove('card-front');
-            });
-            notifyParentToClose(e);
-        }
-    });
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_dojo_search_index(content_hash, _dojos):
+    return build_dojo_search_index(_dojos)
 
-    window.addEventListener('touchstart', notifyParentToClose, {passive: true, capture: true});
-    </script>
-    """)
-    
-    return "".join(html_parts)
+# --- 選手検索 ---
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_player_search_index(content_hash, _schedule_table):
+    return build_player_index(_schedule_table)
 
 # ページ設定 (タイトルとアイコンのみ)
 # st.set_page_config(...) # 冒頭へ移動
@@ -674,8 +120,10 @@ def generate_full_html(df):
 # selected_dojo の初期化はデータ読み込み後に行うためここでは削除
 
 # --- データ読み込み ---
-with st.spinner("Loading..."):
-    data, tournament_title = load_data_and_title()
+with st.spinner("Loading..."), METRICS.timer("load_snapshot"):
+    snapshot = load_data_and_title()
+data, tournament_title = snapshot.grids, snapshot.title
+all_dojos, schedule_table = snapshot.all_dojos, snapshot.schedule_table
 
 # --- OGP / SNS共有用メタタグ ---
 _ogp_title = f"🥋 {tournament_title}" if tournament_title else "🥋 JBJJF タイムテーブル"
@@ -890,48 +338,92 @@ st.markdown("""
 
 # --- メイン画面 ---
 if data:
-    all_dojos = extract_all_dojos(data)
-
-    # --- URLクエリパラメータから団体を復元 ---
-    _qp_dojo = st.query_params.get('dojo', '')
-
-    # selected_dojo が未設定 or 無効の場合は初期化
-    if 'selected_dojo' not in st.session_state or st.session_state['selected_dojo'] not in all_dojos:
-        if all_dojos:
-            # クエリパラメータが有効な団体名なら優先して使用
-            if _qp_dojo in all_dojos:
-                st.session_state['selected_dojo'] = _qp_dojo
-            else:
-                st.session_state['selected_dojo'] = all_dojos[0]
-    elif _qp_dojo in all_dojos and _qp_dojo != st.session_state['selected_dojo']:
-        # URLが手動で変更された場合にも対応
-        st.session_state['selected_dojo'] = _qp_dojo
+    # --- URLクエリパラメータから団体を復元 (?dojo=A&dojo=B で複数) ---
+    _qp_dojos = [d for d in dict.fromkeys(st.query_params.get_all('dojo')) if d in all_dojos]
+
+    # selected_dojos: 先頭がサイドバーで選んだ団体、残りは一緒に表示する団体
+    _selected = [d for d in st.session_state.get('selected_dojos', []) if d in all_dojos]
+    if _qp_dojos and _qp_dojos != _selected:
+        # クエリパラメータが有効な団体名なら優先して使用 (URLが手動で変更された場合にも対応)
+        _selected = _qp_dojos
+    if not _selected and all_dojos:
+        _selected = [all_dojos[0]]
+    st.session_state['selected_dojos'] = _selected
 
     # 現在の選択をURLに反映（常に最新を保持）
-    st.query_params['dojo'] = st.session_state['selected_dojo']
+    st.query_params['dojo'] = st.session_state['selected_dojos']
+    primary_dojo = st.session_state['selected_dojos'][0]
 
     # サイドバー: 団体選択
     # st.sidebar.markdown("---") # 削除
     
+    # 選手検索 (結果はメイン画面のタイムテーブルの上に出す)
+    st.sidebar.markdown('<div class="sidebar-dojo-header">選手</div>', unsafe_allow_html=True)
+    player_query = st.sidebar.text_input(
+        "選手検索", placeholder="選手名・よみ・ローマ字で検索", label_visibility="collapsed"
+    )
+
     # 見出し (16px)
     st.sidebar.markdown(f'<div class="sidebar-dojo-header">団体 ({len(all_dojos)})</div>', unsafe_allow_html=True)
     
-    # 現在の選択を初期値として設定
-    initial_index = 0
-    if st.session_state['selected_dojo'] in all_dojos:
-        initial_index = all_dojos.index(st.session_state['selected_dojo'])
+    # 検索 (かな/カナ・全角/半角・ローマ字の表記ゆれを吸収して部分一致)
+    dojo_index = get_dojo_search_index(snapshot.content_hash, all_dojos)
+    dojo_query = st.sidebar.text_input(
+        "団体検索", placeholder="団体名・よみ・ローマ字で検索", label_visibility="collapsed"
+    )
+    if dojo_query.strip():
+        dojo_options = search_dojos(dojo_index, dojo_query)
+        if not dojo_options:
+            st.sidebar.caption("該当する団体がありません")
+    elif len(all_dojos) > DOJO_GROUP_THRESHOLD:
+        # 団体が多いときは頭文字で分けて、一度に描くラジオボタンを減らす
+        dojo_groups = group_dojos_by_initial(dojo_index)
+        group_names = list(dojo_groups)
+        current_group = next(
+            (g for g, members in dojo_groups.items() if primary_dojo in members),
+            group_names[0]
+        )
+        dojo_group = st.sidebar.selectbox(
+            "頭文字", group_names, index=group_names.index(current_group),
+            format_func=lambda g: f"{g} ({len(dojo_groups[g])})", label_visibility="collapsed"
+        )
+        dojo_options = dojo_groups[dojo_group]
+    else:
+        dojo_options = all_dojos
+
+    # 現在の選択を初期値として設定 (絞り込みで外れたときは未選択表示)
+    initial_index = None
+    if primary_dojo in dojo_options:
+        initial_index = dojo_options.index(primary_dojo)
     
     selected_dojo = st.sidebar.radio(
         label="団体選択",
-        options=all_dojos,
+        options=dojo_options,
         label_visibility="collapsed",
         index=initial_index,
         format_func=lambda x: x
     )
 
-    if selected_dojo != st.session_state['selected_dojo']:
-        st.session_state['selected_dojo'] = selected_dojo
-        st.query_params['dojo'] = selected_dojo  # URLに反映
+    if selected_dojo is not None and selected_dojo != primary_dojo:
+        st.session_state['selected_dojos'] = [selected_dojo] + [
+            d for d in st.session_state['selected_dojos'][1:] if d != selected_dojo
+        ]
+        st.query_params['dojo'] = st.session_state['selected_dojos']  # URLに反映
+        finish_rerun_profile(save=False)  # 途中で打ち切る再実行は計測しない
+        st.rerun()
+
+    # 一緒に表示する団体 (系列ジムなど)。1枚のタイムテーブルに色分けして重ねる
+    extra_dojos = st.sidebar.multiselect(
+        "一緒に表示する団体",
+        options=[d for d in all_dojos if d != primary_dojo],
+        default=st.session_state['selected_dojos'][1:],
+        placeholder="一緒に表示する団体を追加",
+        label_visibility="collapsed"
+    )
+    if extra_dojos != st.session_state['selected_dojos'][1:]:
+        st.session_state['selected_dojos'] = [primary_dojo] + extra_dojos
+        st.query_params['dojo'] = st.session_state['selected_dojos']
+        finish_rerun_profile(save=False)  # 途中で打ち切る再実行は計測しない
         st.rerun()
 
     # 1. ヘッダー (Shareボタン機能修正: Event Delegation + レイアウト調整)
@@ -947,12 +439,36 @@ if data:
 <div id="snackbar" class="snackbar">URLをコピーしました</div>
 """, unsafe_allow_html=True)
 
+    # 選手検索の結果
+    if player_query.strip():
+        with METRICS.timer("search_players"):
+            player_index = get_player_search_index(snapshot.content_hash, schedule_table)
+            df_players = search_players(player_index, schedule_table, player_query)
+        if df_players.empty:
+            st.info(f"「{player_query}」に一致する選手は見つかりませんでした。")
+        else:
+            st.dataframe(
+                df_players[["name", "dojo", "mat", "match_no", "start_time", "category"]].rename(columns={
+                    "name": "選手", "dojo": "団体", "mat": "マット", "match_no": "試合番号",
+                    "start_time": "開始", "category": "カテゴリー",
+                }),
+                hide_index=True, width="stretch"
+            )
+
     # 2. タイムテーブル
-    target = st.session_state['selected_dojo']
-    df_res = get_schedule_data(data, target)
+    targets = st.session_state['selected_dojos']
+    with METRICS.timer("filter_schedule"):
+        if len(targets) == 1:
+            df_res = filter_schedule(schedule_table, targets[0])
+        else:
+            df_res = filter_schedule_multi(schedule_table, targets)
     
     if not df_res.empty:
-        html_code = generate_full_html(df_res)
+        with METRICS.cache_probe("timetable_html"):
+            html_code = render_timetable_cached(
+                tuple(dojo_version(snapshot, d) for d in targets), tuple(targets), df_res
+            )
+        METRICS.observe_size("iframe_payload", len(html_code.encode("utf-8")))
         # 必要な高さをデータから動的計算
         def _t2m(t):
             try: h, m = map(int, t.split(':')); return h * 60 + m
@@ -966,7 +482,7 @@ if data:
             _iframe_h = 600
         components.html(html_code, height=_iframe_h, scrolling=False)
     else:
-        st.info(f"「{target}」の試合は見つかりませんでした。")
+        st.info(f"{''.join(f'「{t}」' for t in targets)}の試合は見つかりませんでした。")
         
     # --- モバイル用クリップボード共有スクリプト ---
     components.html("""
@@ -1121,4 +637,10 @@ if data:
 
 
 else:
-    st.error("データ読み込みエラー")
\ No newline at end of file
+    st.error("データ読み込みエラー")
+
+METRICS.observe_duration("rerun", time.perf_counter() - _rerun_started)
+if finish_rerun_profile() and "profile" in st.query_params:
+    del st.query_params["profile"]  # 計測するのは1回だけ
+if METRICS_DEBUG_KEY and st.query_params.get("debug") == METRICS_DEBUG_KEY:
+    show_metrics_panel()
\ No newline at end of file
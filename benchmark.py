@@ -0,0 +1,223 @@
+"""
+パーサのベンチマーク: 合成ワークブックで各段階の処理時間を測り、履歴と比べる
+
+実行方法:
+    python benchmark.py                      # 既定の規模 (medium)
+    python benchmark.py --size large --repeat 5
+    python benchmark.py --mats 12 --dojos 150 --entrants 300 --width 40
+
+測る段階:
+    - read_excel    : pd.read_excel + グリッド化 (従来の load_data_and_title 相当)
+    - read_grids    : read_workbook_grids (現在の読み込み)
+    - extract_dojos : extract_all_dojos
+    - schedule_one  : get_schedule_data (試合数が最も多い道場 1つ)
+    - schedule_each : get_schedule_data を全道場について1つずつ
+    - schedule_all  : get_all_schedule_data (全道場を1回の走査で)
+    - html          : generate_full_html (試合数が最も多い道場)
+    - reparse       : parse_workbook(previous=前回の版) で、どのシートも変わっていない版を解析し直す (読み込み + シートのハッシュ)
+    - parse_serial  : parse_workbook (読み込み〜全道場の試合表, 直列)             ※ --workers 2 以上のとき
+    - parse_parallel: parse_workbook をシートごとにプロセスプールで (--workers)   ※ 同上
+
+結果は --history のファイル (JSON Lines) に追記し、同じ条件の前回の結果と比べて
+--threshold を超えて遅くなった段階を REGRESSION として表示する (--fail-on-regression で終了コード 1)。
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from jbjjf_timetable import (
+    build_grids,
+    build_cell_index,
+    extract_all_dojos,
+    filter_schedule,
+    generate_full_html,
+    get_all_schedule_data,
+    get_schedule_data,
+    parse_workbook,
+    read_workbook_grids,
+)
+from jbjjf_timetable.synthetic import make_workbook
+
+warnings.filterwarnings("ignore")
+
+# ──────────────────────────────────────────────
+# 設定
+# ──────────────────────────────────────────────
+
+SIZES = {
+    "small": dict(mats=3, dojos=20, entrants=60, width=25),
+    "medium": dict(mats=6, dojos=60, entrants=150, width=30),
+    "large": dict(mats=12, dojos=150, entrants=300, width=40),
+}
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bench_history.jsonl")
+
+
+def measure(func, repeat):
+    """func を repeat 回実行し、(中央値, 最小値, 最後の戻り値) を返す"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), min(times), result
+
+
+def run_benchmarks(raw, repeat, workers=1):
+    """各段階を測り、{段階: {"median": 秒, "min": 秒}} と補足情報を返す"""
+    stages = {}
+
+    def record(name, func):
+        median, best, result = measure(func, repeat)
+        stages[name] = {"median": median, "min": best}
+        return result
+
+    record("read_excel", lambda: build_grids(pd.read_excel(io.BytesIO(raw), sheet_name=None, header=None)))
+    grids = record("read_grids", lambda: read_workbook_grids(raw))
+    dojos = record("extract_dojos", lambda: extract_all_dojos(grids))
+    table = get_all_schedule_data(grids, dojos)
+    busiest = table["dojo"].value_counts().idxmax() if not table.empty else (dojos[0] if dojos else "")
+    cell_index = build_cell_index(grids)
+    record("schedule_one", lambda: get_schedule_data(grids, busiest, cell_index))
+    record("schedule_each", lambda: [get_schedule_data(grids, d, cell_index) for d in dojos])
+    record("schedule_all", lambda: get_all_schedule_data(grids, dojos))
+    df_busiest = filter_schedule(table, busiest)
+    html = record("html", lambda: generate_full_html(df_busiest.copy()))
+    base = parse_workbook(raw, "", "", workers=1)
+    record("reparse", lambda: parse_workbook(raw, "", "", workers=1, previous=base))
+    if workers > 1:
+        record("parse_serial", lambda: parse_workbook(raw, "", "", workers=1))
+        parse_workbook(raw, "", "", workers=workers)  # プロセスの起動は測らない
+        record("parse_parallel", lambda: parse_workbook(raw, "", "", workers=workers))
+
+    info = {
+        "sheets": len(grids),
+        "cells": int(sum(g.cells.size for g in grids.values())),
+        "dojos": len(dojos),
+        "matches": len(table),
+        "html_bytes": len(html.encode("utf-8")),
+    }
+    return stages, info
+
+
+def git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def previous_run(history, params):
+    """同じ条件 (規模・seed・repeat・Python) で最後に記録した結果"""
+    for record in reversed(history):
+        if record.get("params") == params and record.get("python") == platform.python_version():
+            return record
+    return None
+
+
+def report(stages, info, previous, threshold):
+    """結果を表示し、遅くなった段階の名前のリストを返す"""
+    print(f"  シート {info['sheets']} / セル {info['cells']:,} / 道場 {info['dojos']} / 試合行 {info['matches']}"
+          f" / HTML {info['html_bytes']:,} bytes")
+    if previous:
+        print(f"  比較対象: {previous['timestamp']} ({previous.get('revision') or '-'})")
+    print(f"\n  {'stage':<14} {'median':>10} {'min':>10} {'previous':>10} {'delta':>7}")
+    regressions = []
+    for name, t in stages.items():
+        line = f"  {name:<14} {t['median'] * 1000:>8.1f}ms {t['min'] * 1000:>8.1f}ms"
+        prev = (previous or {}).get("stages", {}).get(name)
+        if prev:
+            delta = t["median"] / prev["median"] - 1 if prev["median"] > 0 else 0.0
+            line += f" {prev['median'] * 1000:>8.1f}ms {delta:>+7.0%}"
+            if delta > threshold:
+                line += "  ⚠️ REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成ワークブックでパーサの処理時間を測る")
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium", help="既定の規模")
+    parser.add_argument("--mats", type=int, help="マット (シート) 数")
+    parser.add_argument("--dojos", type=int, help="道場数")
+    parser.add_argument("--entrants", type=int, help="1マットあたりの出場者数")
+    parser.add_argument("--width", type=int, help="シートの列数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="各段階の実行回数 (中央値を記録)")
+    parser.add_argument("--workers", type=int, default=1, help="2 以上なら並列解析 (parse_parallel) も測る")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="履歴ファイル (JSON Lines)")
+    parser.add_argument("--no-record", action="store_true", help="履歴に追記しない")
+    parser.add_argument("--threshold", type=float, default=0.10, help="前回比でこの割合を超えて遅くなったら REGRESSION")
+    parser.add_argument("--fail-on-regression", action="store_true", help="REGRESSION があれば終了コード 1")
+    args = parser.parse_args(argv)
+
+    params = dict(SIZES[args.size])
+    for key in params:
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    params["seed"] = args.seed
+    params["repeat"] = args.repeat
+    if args.workers > 1:
+        params["workers"] = args.workers
+
+    print("=" * 55)
+    print("  JBJJF パーサ ベンチマーク")
+    print("=" * 55)
+    print(f"\n[準備] 合成ワークブックを生成中... {params}")
+    raw = make_workbook(**{k: params[k] for k in ("mats", "dojos", "entrants", "width", "seed")})
+    print(f"  → {len(raw):,} bytes")
+
+    print("\n[計測]")
+    stages, info = run_benchmarks(raw, args.repeat, args.workers)
+    history = load_history(args.history)
+    regressions = report(stages, info, previous_run(history, params), args.threshold)
+
+    if not args.no_record:
+        append_history(args.history, {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "params": params,
+            "info": info,
+            "stages": stages,
+        })
+        print(f"\n  履歴に追記しました: {args.history}")
+
+    if regressions:
+        print(f"\n  ⚠️  前回より {args.threshold:.0%} 以上遅くなった段階: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
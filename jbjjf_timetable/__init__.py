@@ -0,0 +1,43 @@
+"""JBJJF タイムテーブルの取得・解析ライブラリ (Streamlit に依存しない)
+
+import しても Streamlit・pandas・requests は読み込まない。pandas は試合表 (DataFrame) を作るとき、
+requests は取得するときに初めて読み込まれる。
+"""
+from .parser import (
+    SheetGrid,
+    read_workbook_grids,
+    build_grids,
+    extract_all_dojos,
+    build_cell_index,
+    get_all_schedule_data,
+    get_schedule_data,
+    filter_schedule,
+    filter_schedule_multi,
+)
+from .render import generate_full_html, get_belt_color
+from .snapshot import (
+    Snapshot,
+    parse_workbook,
+    workbook_content_hash,
+    save_snapshot,
+    load_cached_snapshot,
+)
+from .parallel import parse_grids_parallel
+from .export import export_static_timetables, export_json_feeds, build_dojo_feed, build_tournament_feed
+from .search import build_dojo_search_index, search_dojos, build_player_index, search_players
+from .metrics import METRICS, Metrics, write_metrics_file, start_metrics_writer
+from .profiling import Profile, profile_section
+from .fetch import SPS_URL, new_fetch_state, fetch_snapshot, SnapshotRefresher
+
+__all__ = [
+    "SheetGrid", "read_workbook_grids", "build_grids", "extract_all_dojos", "build_cell_index",
+    "get_all_schedule_data", "get_schedule_data", "filter_schedule", "filter_schedule_multi",
+    "generate_full_html", "get_belt_color",
+    "Snapshot", "parse_workbook", "workbook_content_hash", "save_snapshot", "load_cached_snapshot",
+    "parse_grids_parallel",
+    "export_static_timetables", "export_json_feeds", "build_dojo_feed", "build_tournament_feed",
+    "build_dojo_search_index", "search_dojos", "build_player_index", "search_players",
+    "METRICS", "Metrics", "write_metrics_file", "start_metrics_writer",
+    "Profile", "profile_section",
+    "SPS_URL", "new_fetch_state", "fetch_snapshot", "SnapshotRefresher",
+]
@@ -0,0 +1,97 @@
+"""コマンドライン: ローカルの xlsx から道場一覧・道場の試合表を JSON で出力する
+
+    python -m jbjjf_timetable dojos FILE.xlsx
+    python -m jbjjf_timetable schedule FILE.xlsx DOJO [DOJO ...]
+    python -m jbjjf_timetable export FILE.xlsx OUTDIR
+
+FILE に - を指定すると標準入力から読む。export は OUTDIR/timetable に道場ごとの HTML、OUTDIR/feed に
+JSON フィードを書き出し (前回と同じ版なら書き直さない)、書き出した結果を JSON で出力する。
+"""
+import argparse
+import json
+import os
+import sys
+
+from .export import export_json_feeds, export_static_timetables
+from .parser import extract_all_dojos, get_all_schedule_data, read_workbook_grids, workbook_read_errors
+from .snapshot import DEFAULT_TITLE, parse_workbook, workbook_content_hash
+
+SCHEDULE_FIELDS = ["dojo", "mat", "match_no", "name", "is_seed", "start_time", "category"]
+
+
+def read_input(path):
+    if path == "-":
+        return sys.stdin.buffer.read()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m jbjjf_timetable", description="xlsx から道場一覧・試合表を JSON で出力する"
+    )
+    parser.add_argument("--reader", choices=["auto", "calamine", "openpyxl", "pandas"],
+                        help="xlsx の読み込み方式 (既定: 環境変数 XLSX_READER または auto)")
+    parser.add_argument("--indent", type=int, default=None, help="JSON のインデント (既定: 1行)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_dojos = sub.add_parser("dojos", help="道場一覧")
+    p_dojos.add_argument("xlsx")
+    p_schedule = sub.add_parser("schedule", help="道場の試合表 (複数指定可)")
+    p_schedule.add_argument("xlsx")
+    p_schedule.add_argument("dojo", nargs="+")
+    p_export = sub.add_parser("export", help="道場ごとの HTML と JSON フィードを書き出す")
+    p_export.add_argument("xlsx")
+    p_export.add_argument("outdir")
+    p_export.add_argument("--title", help="大会名 (既定: ファイル名)")
+    p_export.add_argument("--force", action="store_true", help="同じ版を書き出し済みでも書き直す")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        return export(args)
+
+    try:
+        grids = read_workbook_grids(read_input(args.xlsx), reader=args.reader)
+    except (OSError, *workbook_read_errors()) as e:
+        print(f"読み込めません: {e}", file=sys.stderr)
+        return 1
+    dojos = extract_all_dojos(grids)
+
+    if args.command == "dojos":
+        doc = dojos
+    else:
+        unknown = [d for d in args.dojo if d not in dojos]
+        if unknown:
+            print(f"道場一覧にない名前です (そのまま検索します): {', '.join(unknown)}", file=sys.stderr)
+        table = get_all_schedule_data(grids, args.dojo)
+        doc = table[SCHEDULE_FIELDS].to_dict("records")
+
+    dump(doc, args.indent)
+    return 0
+
+
+def dump(doc, indent):
+    json.dump(doc, sys.stdout, ensure_ascii=False, indent=indent)
+    sys.stdout.write("\n")
+
+
+def export(args):
+    if args.title:
+        title = args.title
+    elif args.xlsx == "-":
+        title = DEFAULT_TITLE
+    else:
+        title = os.path.splitext(os.path.basename(args.xlsx))[0]
+    try:
+        content = read_input(args.xlsx)
+        snapshot = parse_workbook(content, title, workbook_content_hash(content), reader=args.reader)
+    except (OSError, *workbook_read_errors()) as e:
+        print(f"読み込めません: {e}", file=sys.stderr)
+        return 1
+
+    written = {
+        "timetable": export_static_timetables(snapshot, os.path.join(args.outdir, "timetable"), args.force),
+        "feed": export_json_feeds(snapshot, os.path.join(args.outdir, "feed"), args.force),
+    }
+    dump({"title": title, "version": snapshot.content_hash, "dojos": len(snapshot.all_dojos), "written": written},
+         args.indent)
+    return 0
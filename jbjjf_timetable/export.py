@@ -0,0 +1,170 @@
+"""Snapshot を静的ファイルとして書き出す (道場ごとのタイムテーブル HTML と JSON フィード)
+
+    export_static_timetables(snapshot, "static/timetable")  # <slug>.html・index.html・dojos.json
+    export_json_feeds(snapshot, "static/feed")              # <slug>.json と tournament.json
+
+ファイル名は道場名から作った slug (dojo_slug) で、アプリと同じ形の URL からは index.html がたどる。
+app.py の書き出し先 (enableStaticServing) では次の URL になる:
+
+    /app/static/timetable/index.html?dojo=<道場名>  → <slug>.html へ転送 (アプリの ?dojo= と同じ名前)
+    /app/static/timetable/<slug>.html               道場ごとのタイムテーブル
+    /app/static/timetable/dojos.json                {道場名: slug} (feed/tournament.json の "dojos" と同じ)
+    /app/static/feed/<slug>.json                    道場ごとの JSON フィード
+
+どちらも書き出し先に manifest.json を置き、同じ版を書き出し済みなら何もしない。版が変わっても、
+試合行が前回から変わっていない道場のファイルは書き直さず、前の版にしかない道場のファイルは消す。
+
+道場ごとのフィードの version はその道場の試合行の版で、試合行が変わったときしか書き換えないので、
+静的配信の ETag / If-None-Match で再取得は 304 になる (tournament.json の version はワークブックの版 content_hash)。
+"""
+import hashlib
+import json
+import os
+from html import escape
+
+from .metrics import METRICS
+from .parser import filter_schedule
+from .render import generate_full_html
+from .snapshot import dojo_version, write_atomic
+
+FEED_FIELDS = ["mat", "match_no", "name", "is_seed", "start_time", "category"]
+
+def dojo_slug(dojo):
+    """道場名からファイル名を作る (日本語・記号を含むので名前のハッシュを使う)"""
+    return hashlib.sha1(dojo.encode("utf-8")).hexdigest()[:12]
+
+def dojo_slugs(snapshot):
+    """{道場名: slug}。静的ファイルを道場名から探すための対応表"""
+    return {dojo: dojo_slug(dojo) for dojo in snapshot.all_dojos}
+
+def _script_json(doc):
+    """<script> に埋め込む JSON (道場名の "</script>" などで閉じられないように < を逃がす)"""
+    return json.dumps(doc, ensure_ascii=False).replace("<", "\\u003c")
+
+# ?dojo=<道場名> (複数あれば最初に一致したもの) で開かれたら、その道場のページへ転送する
+_REDIRECT_SCRIPT = """<script>
+(function () {
+    var slugs = %s;
+    var names = new URLSearchParams(location.search).getAll("dojo");
+    for (var i = 0; i < names.length; i++) {
+        if (Object.prototype.hasOwnProperty.call(slugs, names[i])) {
+            location.replace(slugs[names[i]] + ".html");
+            return;
+        }
+    }
+})();
+</script>"""
+
+def _static_page(title, body):
+    return (
+        '<!DOCTYPE html>\n<html lang="ja"><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        f'<title>{escape(title)}</title></head>\n<body>\n{body}\n</body></html>\n'
+    )
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _unchanged_file(out_dir, name, version, previous_versions):
+    """前回と同じ版のファイルが残っていれば True (書き直さない)"""
+    hit = previous_versions.get(name) == version and os.path.exists(os.path.join(out_dir, name))
+    METRICS.record_cache("static_file", hit=hit)
+    return hit
+
+def _write_manifest(out_dir, snapshot, files, versions):
+    manifest = {
+        "content_hash": snapshot.content_hash, "title": snapshot.title, "files": files, "versions": versions,
+    }
+    write_atomic(
+        os.path.join(out_dir, "manifest.json"),
+        json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"),
+    )
+
+def _remove_stale(out_dir, suffix, keep):
+    """前の版にしかない道場のファイルを消す"""
+    for name in os.listdir(out_dir):
+        if name.endswith(suffix) and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+
+# --- タイムテーブル HTML ---
+
+def export_static_timetables(snapshot, out_dir, force=False):
+    """Snapshot から道場ごとの HTML と index.html を書き出す。同じ版を書き出し済みなら何もしない (False)。
+    試合行が前回から変わっていない道場のページは書き直さない"""
+    manifest = {} if force else _read_manifest(out_dir)
+    if manifest.get("content_hash") == snapshot.content_hash:
+        return False
+    os.makedirs(out_dir, exist_ok=True)
+
+    slugs = dojo_slugs(snapshot)
+    files = {}
+    versions = {}
+    index_items = []
+    for dojo, slug in slugs.items():
+        df = filter_schedule(snapshot.schedule_table, dojo)
+        files[f"{slug}.html"] = dojo
+        versions[f"{slug}.html"] = f"{dojo_version(snapshot, dojo)}:{snapshot.title}"
+        if not _unchanged_file(out_dir, f"{slug}.html", versions[f"{slug}.html"], manifest.get("versions", {})):
+            write_atomic(
+                os.path.join(out_dir, f"{slug}.html"),
+                _static_page(f"{dojo} | {snapshot.title}", generate_full_html(df)).encode("utf-8"),
+            )
+        index_items.append(f'<li><a href="{slug}.html">{escape(dojo)}</a> ({len(df)})</li>')
+
+    index_body = (
+        f'<h1 style="font-size: 18px;">🥋 {escape(snapshot.title)}</h1>'
+        f'<ul style="line-height: 1.8;">{"".join(index_items)}</ul>'
+        + _REDIRECT_SCRIPT % _script_json(slugs)
+    )
+    write_atomic(os.path.join(out_dir, "index.html"), _static_page(snapshot.title, index_body).encode("utf-8"))
+    write_atomic(os.path.join(out_dir, "dojos.json"), _feed_bytes(slugs))
+
+    _remove_stale(out_dir, ".html", set(files) | {"index.html"})
+    _write_manifest(out_dir, snapshot, files, versions)
+    return True
+
+# --- JSON フィード ---
+
+def _feed_bytes(doc):
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def build_dojo_feed(snapshot, dojo):
+    df = filter_schedule(snapshot.schedule_table, dojo)
+    return {
+        "version": dojo_version(snapshot, dojo), "tournament": snapshot.title, "dojo": dojo,
+        "matches": df[FEED_FIELDS].to_dict("records"),
+    }
+
+def build_tournament_feed(snapshot):
+    table = snapshot.schedule_table
+    return {
+        "version": snapshot.content_hash, "tournament": snapshot.title,
+        "dojos": dojo_slugs(snapshot),
+        "matches": table[["dojo"] + FEED_FIELDS].to_dict("records"),
+    }
+
+def export_json_feeds(snapshot, out_dir, force=False):
+    """Snapshot から JSON フィードを書き出す。同じ版を書き出し済みなら何もしない (False)。
+    試合行が前回から変わっていない道場のフィードは書き直さない"""
+    manifest = {} if force else _read_manifest(out_dir)
+    if manifest.get("content_hash") == snapshot.content_hash:
+        return False
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = {}
+    versions = {}
+    for dojo in snapshot.all_dojos:
+        name = f"{dojo_slug(dojo)}.json"
+        files[name] = dojo
+        versions[name] = f"{dojo_version(snapshot, dojo)}:{snapshot.title}"
+        if not _unchanged_file(out_dir, name, versions[name], manifest.get("versions", {})):
+            write_atomic(os.path.join(out_dir, name), _feed_bytes(build_dojo_feed(snapshot, dojo)))
+    write_atomic(os.path.join(out_dir, "tournament.json"), _feed_bytes(build_tournament_feed(snapshot)))
+
+    _remove_stale(out_dir, ".json", set(files) | {"tournament.json", "manifest.json"})
+    _write_manifest(out_dir, snapshot, files, versions)
+    return True
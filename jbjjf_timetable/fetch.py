@@ -0,0 +1,151 @@
+"""スプレッドシートの取得 (条件付き GET) とバックグラウンド更新"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from .metrics import METRICS
+from .profiling import PROFILE_PARSE, profile_section
+from .snapshot import (
+    EMPTY_SNAPSHOT, extract_title, load_cached_snapshot, parse_workbook, save_snapshot, workbook_content_hash,
+)
+
+# --- データ取得ロジック ---
+SPS_URL = "https://docs.google.com/spreadsheets/u/1/d/e/2PACX-1vQoIxREOSKT14WEJRKj3VuOXhodOxydJusm-c9BZD-d9idHwXQHeCkEJJd8HzxAyH6OoeMxn9UMne2a/pub?output=xlsx"
+
+def new_fetch_state(cache_dir=None, url=None):
+    """条件付き取得の状態。ディスクに前回の版があればそこから始める (プロセス全体で1つ作って使い回す)"""
+    with METRICS.timer("load_cached_snapshot"):
+        snapshot, latest = load_cached_snapshot(cache_dir)
+    METRICS.record_cache("disk_snapshot", hit=snapshot is not None)
+    if snapshot is not None and latest.get("saved_at"):
+        METRICS.mark_time("snapshot", latest["saved_at"])
+    return {
+        "lock": threading.Lock(),
+        "url": url or SPS_URL,
+        "cache_dir": cache_dir,
+        "etag": latest.get("etag"),
+        "last_modified": latest.get("last_modified"),
+        "snapshot": snapshot,
+    }
+
+def fetch_snapshot(state):
+    """前回から変化がなければ前回の Snapshot をそのまま返す (パースもしない)。
+
+    サーバーが ETag / Last-Modified を返す場合は条件付き GET (304) で本文の転送自体を省き、
+    返さない場合は本文のハッシュで変化を判定する。
+    """
+    import requests  # 取得するときだけ読み込む (解析だけなら不要)
+
+    with state["lock"]:
+        prev = state["snapshot"]
+        headers = {}
+        if prev is not None:
+            if state["etag"]:
+                headers["If-None-Match"] = state["etag"]
+            if state["last_modified"]:
+                headers["If-Modified-Since"] = state["last_modified"]
+
+        with METRICS.timer("fetch"):
+            resp = requests.get(state["url"], headers=headers, verify=False, timeout=30)
+        METRICS.record_cache("http", hit=resp.status_code == 304)
+        if resp.status_code == 304 and prev is not None:
+            return prev
+        resp.raise_for_status()
+        METRICS.observe_size("fetch", len(resp.content))
+        # 新しい ETag / Last-Modified は、その版の Snapshot ができてから state に入れる
+        # (先に入れると、解析に失敗したあとの取得が 304 になり、古い版を出し続けてしまう)
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+
+        content_hash = workbook_content_hash(resp.content)
+        title = extract_title(resp.headers)
+        unchanged = prev is not None and prev.content_hash == content_hash and prev.title == title
+        METRICS.record_cache("workbook", hit=unchanged)
+        if unchanged:
+            state["etag"], state["last_modified"] = etag, last_modified
+            return prev
+
+        with METRICS.timer("parse"), profile_section(f"parse_{content_hash[:12]}", forced=PROFILE_PARSE):
+            snapshot = parse_workbook(resp.content, title, content_hash, previous=prev)
+        state["snapshot"] = snapshot
+        state["etag"], state["last_modified"] = etag, last_modified
+        METRICS.mark_time("snapshot")
+        try:
+            with METRICS.timer("save_snapshot"):
+                save_snapshot(snapshot, state["etag"], state["last_modified"], state["cache_dir"])
+        except OSError:
+            pass  # ディスクに書けなくても表示は続ける
+        return snapshot
+
+# --- バックグラウンド更新 ---
+# 試合時間帯 (JST) は短い間隔で、それ以外 (夜間) はゆっくり確認する
+REFRESH_INTERVAL_ACTIVE = 30
+REFRESH_INTERVAL_IDLE = 15 * 60
+REFRESH_INTERVAL_RETRY = 10
+ACTIVE_HOURS_JST = range(7, 21)
+FIRST_LOAD_TIMEOUT = 45
+
+def jst_now():
+    return datetime.now(timezone.utc) + timedelta(hours=9)
+
+def refresh_interval(now=None):
+    now = now or jst_now()
+    return REFRESH_INTERVAL_ACTIVE if now.hour in ACTIVE_HOURS_JST else REFRESH_INTERVAL_IDLE
+
+class SnapshotRefresher:
+    """プロセス全体で1本だけ動く更新スレッド (stale-while-revalidate)。
+
+    再実行 (rerun) は current() で手元の最新版を即座に読むだけで、ネットワークを待たない。
+    取得はこのスレッドだけが行うので、同時アクセスがあっても重複して取りに行かない。
+    """
+
+    def __init__(self, state, on_publish=None):
+        self.state = state
+        self.on_publish = on_publish  # 新しい版を取得したときに呼ぶ (静的ファイルの書き出しなど)
+        self.snapshot = state["snapshot"]
+        self.checked_at = None  # 最後に取得を確認できた時刻 (変化なしを含む)
+        self.first_load = threading.Event()
+        if self.snapshot is not None:
+            self.first_load.set()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """更新スレッドを止め、終わるまで待つ (取得・書き出しの途中なら、それが終わってから止まる)"""
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def current(self, timeout=FIRST_LOAD_TIMEOUT):
+        # 起動直後でまだ1版もないときだけ、初回の読み込みを待つ
+        if self.snapshot is None:
+            self.first_load.wait(timeout)
+        return self.snapshot or EMPTY_SNAPSHOT
+
+    def _run(self):
+        published_hash = None
+        while not self.stopped.is_set():
+            try:
+                self.snapshot = fetch_snapshot(self.state)
+                self.checked_at = time.time()
+                METRICS.mark_time("snapshot_check", self.checked_at)
+                interval = refresh_interval()
+            except Exception:
+                METRICS.inc("refresh_failures")
+                # 失敗しても前回の版を表示し続け、少し待って再試行する
+                interval = REFRESH_INTERVAL_RETRY
+            finally:
+                self.first_load.set()
+            if self.on_publish and self.snapshot is not None and self.snapshot.content_hash != published_hash:
+                try:
+                    with METRICS.timer("publish"):
+                        self.on_publish(self.snapshot)
+                    published_hash = self.snapshot.content_hash
+                except Exception:
+                    # 静的ファイルの書き出しに失敗してもアプリの表示には影響させない (次の周期で再試行する)
+                    METRICS.inc("publish_failures")
+            self.stopped.wait(interval)
@@ -0,0 +1,209 @@
+"""処理段階ごとの計測 (所要時間・バイト数・キャッシュのヒット/ミス・版の鮮度)
+
+プロセス全体で1つの METRICS に記録し、Prometheus のテキスト形式で書き出す。
+
+    with METRICS.timer("read"):            # 所要時間 → jbjjf_stage_duration_seconds{stage="read"}
+        ...
+    METRICS.observe_size("fetch", n)        # バイト数 → jbjjf_stage_bytes{stage="fetch"}
+    METRICS.record_cache("http", hit=True)  # → jbjjf_cache_requests_total{cache="http",result="hit"}
+    METRICS.mark_time("snapshot")           # → jbjjf_snapshot_age_seconds (書き出し時点からの経過秒)
+
+st.cache_data のように「ミスしたときだけ本体が動く」キャッシュは、呼び出し側を cache_probe で囲み、
+本体の中で mark_miss を呼ぶ (同じスレッドで実行されるので、他のセッションの呼び出しと混ざらない)。
+
+Streamlit には依存しない。
+"""
+import bisect
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PREFIX = "jbjjf_"
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+RECENT_SAMPLES = 512  # パーセンタイル (デバッグ表示) は直近この件数から出す
+METRICS_FILE_INTERVAL = 15
+
+class _Histogram:
+    """Prometheus のヒストグラム (累積バケット・合計・件数) と、直近の値"""
+    __slots__ = ("bounds", "counts", "count", "total", "recent")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def quantile(self, q):
+        values = sorted(self.recent)
+        if not values:
+            return math.nan
+        return values[min(int(q * len(values)), len(values) - 1)]
+
+def _fmt(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = {}   # 段階 → _Histogram [秒]
+        self._sizes = {}       # 段階 → _Histogram [bytes]
+        self._caches = {}      # キャッシュ名 → [ヒット数, ミス数]
+        self._counters = {}    # 名前 → 回数
+        self._times = {}       # 名前 → UNIX 時刻 (経過秒として出す)
+        self._local = threading.local()
+
+    # --- 記録 ---
+    def observe_duration(self, stage, seconds):
+        with self._lock:
+            hist = self._durations.get(stage)
+            if hist is None:
+                hist = self._durations[stage] = _Histogram(DURATION_BUCKETS)
+            hist.observe(seconds)
+
+    def observe_size(self, stage, nbytes):
+        with self._lock:
+            hist = self._sizes.get(stage)
+            if hist is None:
+                hist = self._sizes[stage] = _Histogram(SIZE_BUCKETS)
+            hist.observe(nbytes)
+
+    @contextmanager
+    def timer(self, stage):
+        """with ブロックの所要時間を記録する (例外で抜けたときは記録しない)"""
+        t0 = time.perf_counter()
+        yield
+        self.observe_duration(stage, time.perf_counter() - t0)
+
+    def record_cache(self, name, hit):
+        with self._lock:
+            self._caches.setdefault(name, [0, 0])[0 if hit else 1] += 1
+
+    @contextmanager
+    def cache_probe(self, name):
+        """ブロック内で mark_miss(name) が呼ばれなければヒットとして数える"""
+        pending = self._local.__dict__.setdefault("pending", {})
+        pending[name] = False
+        try:
+            yield
+        finally:
+            self.record_cache(name, hit=not pending.pop(name))
+
+    def mark_miss(self, name):
+        pending = getattr(self._local, "pending", None)
+        if pending is not None and name in pending:
+            pending[name] = True
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def mark_time(self, name, timestamp=None):
+        with self._lock:
+            self._times[name] = time.time() if timestamp is None else timestamp
+
+    # --- 参照 ---
+    def age(self, name, now=None):
+        with self._lock:
+            ts = self._times.get(name)
+        return None if ts is None else (now or time.time()) - ts
+
+    def summary(self):
+        """デバッグ表示用: (段階ごとの行, キャッシュごとの行, {名前: 経過秒})"""
+        now = time.time()
+        with self._lock:
+            stages = []
+            for stage in sorted(set(self._durations) | set(self._sizes)):
+                row = {"stage": stage}
+                hist = self._durations.get(stage)
+                if hist is not None:
+                    row.update({
+                        "count": hist.count,
+                        "p50_ms": hist.quantile(0.5) * 1000,
+                        "p95_ms": hist.quantile(0.95) * 1000,
+                        "p99_ms": hist.quantile(0.99) * 1000,
+                        "max_ms": max(hist.recent) * 1000,
+                    })
+                sizes = self._sizes.get(stage)
+                if sizes is not None:
+                    row.update({"last_bytes": int(sizes.recent[-1]), "p95_bytes": int(sizes.quantile(0.95))})
+                stages.append(row)
+            caches = [
+                {"cache": name, "hit": hit, "miss": miss, "hit_ratio": hit / (hit + miss) if hit + miss else math.nan}
+                for name, (hit, miss) in sorted(self._caches.items())
+            ]
+            ages = {name: now - ts for name, ts in sorted(self._times.items())}
+        return stages, caches, ages
+
+    def render_prometheus(self):
+        """Prometheus のテキスト形式 (exposition format 0.0.4)"""
+        now = time.time()
+        lines = []
+        with self._lock:
+            for metric, unit_help, hists in (
+                ("stage_duration_seconds", "Duration of each processing stage.", self._durations),
+                ("stage_bytes", "Payload size of each processing stage.", self._sizes),
+            ):
+                if not hists:
+                    continue
+                name = PREFIX + metric
+                lines += [f"# HELP {name} {unit_help}", f"# TYPE {name} histogram"]
+                for stage, hist in sorted(hists.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.bounds, hist.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{_fmt(float(bound))}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {_fmt(hist.total)}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+            if self._caches:
+                name = PREFIX + "cache_requests_total"
+                lines += [f"# HELP {name} Cache lookups by result.", f"# TYPE {name} counter"]
+                for cache, (hit, miss) in sorted(self._caches.items()):
+                    lines.append(f'{name}{{cache="{cache}",result="hit"}} {hit}')
+                    lines.append(f'{name}{{cache="{cache}",result="miss"}} {miss}')
+            for counter, value in sorted(self._counters.items()):
+                name = f"{PREFIX}{counter}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {value}"]
+            for key, ts in sorted(self._times.items()):
+                name = f"{PREFIX}{key}_age_seconds"
+                lines += [f"# TYPE {name} gauge", f"{name} {_fmt(round(now - ts, 3))}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear(); self._sizes.clear(); self._caches.clear()
+            self._counters.clear(); self._times.clear()
+
+METRICS = Metrics()
+
+def write_metrics_file(path, metrics=METRICS):
+    from .snapshot import write_atomic  # snapshot がこのモジュールを読み込むため、使うときに読み込む
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    write_atomic(path, metrics.render_prometheus().encode())
+
+def start_metrics_writer(path, interval=METRICS_FILE_INTERVAL, metrics=METRICS):
+    """interval 秒ごとに path へ書き出すスレッドを起動する (アクセスがなくても鮮度の値を更新するため)"""
+    def _run():
+        while True:
+            try:
+                write_metrics_file(path, metrics)
+            except OSError:
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=_run, name="metrics-writer", daemon=True)
+    thread.start()
+    return thread
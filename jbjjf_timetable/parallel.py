@@ -0,0 +1,153 @@
+"""マット (シート) ごとの解析をプロセスプールで並列に行う
+
+シートどうしは独立しているので、解析を2段階に分けて各段階をシート単位でワーカーに配る:
+
+    1. 読み込み・グリッド化・道場候補の抽出 (ワーカーは xlsx から自分のシートだけを読む)
+    2. 全シートの道場一覧がそろってから、試合表の行を作る (行数の多いシートは行の帯に分ける)
+
+グリッド化はカテゴリー見出しの引き継ぎなどシート全体を見るので、帯に分けるのは 2 だけ。
+結果はワーカーが終わった順ではなく常にシートの並び順 (帯は行順) で結合するので、直列の
+parse と同じ道場一覧・試合表になる。
+
+前の版を渡すと、1 でワーカーはセル値のハッシュが前の版と同じならグリッドを作らずに返し、そのシートは
+前の版の結果を使う (直列の parse_sheets と同じく、増減した道場名を含むシートだけ 2 をやり直す)。
+
+ワーカー数は環境変数 PARSE_WORKERS (既定 1 = 直列、"auto" = CPU 数)。プールは spawn で作り、
+次の版の解析でも使い回す (取得スレッドが動いているプロセスから fork しないため)。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .metrics import METRICS
+from .parser import (
+    ROW_READERS,
+    SheetResult,
+    extract_all_dojos,
+    grid_from_rows,
+    merge_sheet_results,
+    read_workbook_grids,
+    read_workbook_rows,
+    resolve_reader,
+    sheet_content_hash,
+    sheet_hits,
+    sheet_schedule_records,
+    sort_dojos,
+    workbook_sheet_names,
+)
+
+def _parse_workers(value):
+    if value == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(int(value), 1)
+    except ValueError:
+        return 1
+
+PARSE_WORKERS = _parse_workers(os.environ.get("PARSE_WORKERS", "1"))
+BAND_ROWS = 2000     # 試合表の段階で、これより行数の多いシートは帯に分ける
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+def _discard_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+# --- ワーカー側の処理 (どれも引数と戻り値だけで完結する) ---
+
+def _prepare_sheet(content, sheet_name, reader, previous_hash=None):
+    """1シートを読んでグリッド化し、(グリッド, そのシートの道場候補, シートのハッシュ) を返す。
+    ハッシュが previous_hash と同じなら (None, None, ハッシュ)"""
+    if reader in ROW_READERS:
+        rows = read_workbook_rows(content, reader, sheets={sheet_name})[sheet_name]
+        content_hash = sheet_content_hash(rows)
+        if content_hash == previous_hash:
+            return None, None, content_hash
+        grid = grid_from_rows(rows)
+    else:
+        content_hash, grid = None, read_workbook_grids(content, reader, sheets={sheet_name})[sheet_name]
+    return grid, extract_all_dojos({sheet_name: grid}), content_hash
+
+def _schedule_band(sheet_name, grid, dojos, r0, r1):
+    return sheet_schedule_records(sheet_name, grid, sheet_hits(grid, set(dojos), r0, r1))
+
+# --- 呼び出し側 ---
+
+def row_bands(rows, band_rows=BAND_ROWS):
+    """[0, rows) を band_rows 行ずつの (開始, 終了) に分ける"""
+    return [(r0, min(r0 + band_rows, rows)) for r0 in range(0, max(rows, 1), band_rows)]
+
+def parse_sheets_parallel(content, workers=None, reader=None, band_rows=BAND_ROWS, previous=None):
+    """(grids, all_dojos, {シート名: SheetResult}) を返す。
+
+    previous (前の版の Snapshot) とセル値が同じシートは、グリッド・道場候補・試合表の行を前の版から使う。
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    reader = resolve_reader(reader)
+    prev_results = (previous.sheet_results or {}) if previous is not None else {}
+    sheet_names = workbook_sheet_names(content, reader)
+    pool = _get_pool(workers)
+    try:
+        prepared = [
+            pool.submit(_prepare_sheet, content, name, reader,
+                        prev_results[name].content_hash if name in prev_results else None)
+            for name in sheet_names
+        ]
+        grids, sheet_dojos, hashes, reused = {}, {}, {}, set()
+        for name, future in zip(sheet_names, prepared):
+            grid, dojos, hashes[name] = future.result()
+            if grid is None:
+                reused.add(name)
+                grids[name], sheet_dojos[name] = previous.grids[name], prev_results[name].dojos
+                continue
+            for arr in grid:
+                arr.flags.writeable = False  # pickle を経由すると書き込み可に戻るため
+            grids[name], sheet_dojos[name] = grid, dojos
+        all_dojos = sort_dojos(set().union(*sheet_dojos.values()))
+
+        # 前の版から道場一覧が増減していなければ、使い回すシートの行はそのまま使える
+        changed_dojos = set(all_dojos) ^ set(previous.all_dojos) if reused else set()
+        redo = [
+            name for name, grid in grids.items()
+            if name not in reused or (changed_dojos and sheet_hits(grid, changed_dojos))
+        ]
+        bands = [
+            (name, pool.submit(_schedule_band, name, grids[name], all_dojos, r0, r1))
+            for name in redo
+            for r0, r1 in row_bands(grids[name].cells.shape[0], band_rows)
+        ]
+        records = {name: [] for name in redo}
+        for name, future in bands:
+            records[name].extend(future.result())
+    except BrokenProcessPool:
+        _discard_pool()  # 次回は作り直す
+        raise
+    METRICS.inc("sheets_parsed", len(grids) - len(reused))
+    METRICS.inc("sheets_reused", len(reused))
+    results = {}
+    for name in grids:
+        rows = records[name] if name in records else prev_results[name].records
+        results[name] = SheetResult(hashes[name], sheet_dojos[name], rows)
+    return grids, all_dojos, results
+
+def parse_grids_parallel(content, workers=None, reader=None, band_rows=BAND_ROWS):
+    """(grids, all_dojos, schedule_table) を返す。直列の read → extract → get_all_schedule_data と同じ結果"""
+    grids, all_dojos, results = parse_sheets_parallel(content, workers, reader, band_rows)
+    return grids, all_dojos, merge_sheet_results(results)
@@ -0,0 +1,576 @@
+"""ワークブックの解析: xlsx → グリッド → 道場一覧 → 試合表 (Streamlit に依存しない)"""
+import hashlib
+import importlib.util
+import io
+import os
+import pickle
+import re
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+
+# pandas は読み込みに時間がかかるので、DataFrame を作る関数の中で必要になったときに読み込む
+# (道場一覧を出すだけの CLI やワーカーの起動を軽くするため)
+
+def clean_val(v): return re.sub(r'\.0$', '', str(v).strip())
+
+def is_valid_id(text):
+    return is_valid_clean_id(clean_val(text))
+
+def is_valid_clean_id(text):
+    """クリーニング済みの文字列に対する is_valid_id"""
+    if text in ["nan", "", "-", "No", "•", "Result"]: return False
+    if re.match(r'^\d+-\d+$', text): return True
+    if text.isdigit() and int(text) < 999: return True
+    return False
+
+RE_TIME = re.compile(r'(\d{1,2}:\d{2})')
+
+def extract_time_from_line(line_txt):
+    m = RE_TIME.search(line_txt)
+    return m.group(1) if m else "-"
+
+def has_time_pattern(text): return RE_TIME.search(str(text)) is not None
+def is_time_signal(text): return "集合" in text or has_time_pattern(text)
+
+def collect_times_vertical_strip(cells, id_row, id_col):
+    rows, cols = cells.shape; found_times = []
+    target_cols = [id_col - 1, id_col - 2]
+    for c in target_cols:
+        if c < 0: continue
+        for r in range(id_row, min(rows, id_row + 4)):
+            val = cells[r, c]
+            times = re.findall(r'(\d{1,2}:\d{2})', val)
+            for t in times: 
+                if t not in found_times: found_times.append(t)
+        if len(found_times) >= 1: break
+    found_times.sort()
+    t_s = found_times[0] if len(found_times) >= 1 else "-"
+    t_k = found_times[1] if len(found_times) >= 2 else "-"
+    t_b = found_times[2] if len(found_times) >= 3 else "-"
+    return t_s, t_k, t_b
+
+# --- グリッド化 ---
+# cells        : clean_val 済みの文字列 (NaN → "", 末尾の .0 を除去)
+# row_category : 各行に適用されるカテゴリー名 (その行より上で直近のカテゴリー見出し)
+# row_text     : 行の全セルを " " で連結した文字列
+# row_gather   : 行に「集合」を含むか
+# row_weigh    : 行に「計量」を含むか
+# row_time     : 行で最初に現れる時刻 (なければ "-")
+# time_mask    : 時刻または「集合」を含むセル
+# id_mask      : 試合番号として有効なセル (is_valid_clean_id)
+# near_mask    : id_mask のうち、そのセルから下3行・左1〜右2列以内に time_mask があるもの
+# *_sat        : 上記マスクの累積和 (summed-area table)。矩形内の個数を O(1) で数える
+SheetGrid = namedtuple("SheetGrid", [
+    "cells", "row_category", "row_text", "row_gather", "row_weigh", "row_time",
+    "time_mask", "time_sat", "id_mask", "id_sat", "near_mask", "near_sat",
+])
+
+CATEGORY_KEYWORDS = ("帯", "Weight", "Category")
+CATEGORY_LOOKBACK = 299  # 見出しを探すのは何行上まで
+UNKNOWN_CATEGORY = "不明"
+
+_strip_cells = np.frompyfunc(str.strip, 1, 1)
+_drop_trailing_zero = np.frompyfunc(lambda s: s[:-2] if s.endswith(".0") else s, 1, 1)
+
+def build_row_category(text):
+    """行ごとのカテゴリー名を作る。text は strip のみの文字列グリッド"""
+    rows = text.shape[0]
+    row_category = np.full(rows, UNKNOWN_CATEGORY, dtype=object)
+    header_row = -1; header = UNKNOWN_CATEGORY
+    for r in range(rows):
+        if header_row >= 0 and r - header_row <= CATEGORY_LOOKBACK:
+            row_category[r] = header
+        line_vals = text[r].tolist()
+        if any(k in " ".join(line_vals) for k in CATEGORY_KEYWORDS):
+            cands = [v for v in line_vals if len(v) > 4]
+            if cands:
+                header_row = r; header = cands[0]
+    return row_category
+
+def cell_mask(cells, predicate):
+    """セルごとの判定結果の bool 配列。同じ文字列は1回だけ判定する"""
+    memo = {}
+    flat = []
+    for v in cells.ravel().tolist():
+        hit = memo.get(v)
+        if hit is None:
+            hit = memo[v] = predicate(v)
+        flat.append(hit)
+    return np.array(flat, dtype=bool).reshape(cells.shape)
+
+def summed_area_table(mask):
+    rows, cols = mask.shape
+    sat = np.zeros((rows + 1, cols + 1), dtype=np.int32)
+    sat[1:, 1:] = mask.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+    return sat
+
+def window_count(sat, r0, r1, c0, c1):
+    """[r0, r1) × [c0, c1) にある True の数 (シート外は切り詰める)"""
+    rows = sat.shape[0] - 1; cols = sat.shape[1] - 1
+    r0 = max(r0, 0); c0 = max(c0, 0); r1 = min(r1, rows); c1 = min(c1, cols)
+    if r0 >= r1 or c0 >= c1:
+        return 0
+    return int(sat[r1, c1] - sat[r0, c1] - sat[r1, c0] + sat[r0, c0])
+
+def build_near_mask(id_mask, time_sat):
+    rows, cols = id_mask.shape
+    r0 = np.arange(rows)[:, None]; c = np.arange(cols)[None, :]
+    r1 = np.minimum(r0 + 4, rows); c0 = np.maximum(c - 1, 0); c1 = np.minimum(c + 3, cols)
+    counts = time_sat[r1, c1] - time_sat[r0, c1] - time_sat[r1, c0] + time_sat[r0, c0]
+    return id_mask & (counts > 0)
+
+def _grid_from_values(values):
+    text = _strip_cells(values).astype(object)
+    cells = _drop_trailing_zero(text).astype(object)
+    row_text = np.array([" ".join(row) for row in cells.tolist()] or [], dtype=object)
+    time_mask = cell_mask(cells, is_time_signal)
+    time_sat = summed_area_table(time_mask)
+    id_mask = cell_mask(cells, is_valid_clean_id)
+    near_mask = build_near_mask(id_mask, time_sat)
+    grid = SheetGrid(
+        cells=cells,
+        row_category=build_row_category(text),
+        row_text=row_text,
+        row_gather=np.array(["集合" in t for t in row_text], dtype=bool),
+        row_weigh=np.array(["計量" in t for t in row_text], dtype=bool),
+        row_time=np.array([extract_time_from_line(t) for t in row_text], dtype=object),
+        time_mask=time_mask, time_sat=time_sat,
+        id_mask=id_mask, id_sat=summed_area_table(id_mask),
+        near_mask=near_mask, near_sat=summed_area_table(near_mask),
+    )
+    for arr in grid:
+        arr.flags.writeable = False
+    return grid
+
+def build_grid(df):
+    """DataFrame を読み取り専用の文字列グリッドに変換する"""
+    return _grid_from_values(df.fillna("").astype(str).to_numpy(dtype=object))
+
+def build_grids(sheets):
+    """read_excel の結果 {シート名: DataFrame} を {シート名: SheetGrid} に変換する"""
+    return {sheet_name: build_grid(df) for sheet_name, df in sheets.items()}
+
+# --- xlsx 読み込み ---
+# XLSX_READER:
+#   auto     : python-calamine が入っていれば calamine、なければ openpyxl のストリーミング読み込み
+#   calamine : python-calamine (Rust 製、最速)
+#   openpyxl : openpyxl の read_only モードで行を順に読み、DataFrame を作らずにグリッド化する
+#   pandas   : 従来どおり pd.read_excel で全シートの DataFrame を作ってからグリッド化する
+XLSX_READER = os.environ.get("XLSX_READER", "auto")
+
+# pd.read_excel が欠損値 (→ 空セル) とみなす文字列とエラー値。pandas 経由と同じグリッドになるよう合わせる
+EXCEL_NA_VALUES = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    "#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!",
+}
+
+def cell_to_str(v):
+    """セルの値を pd.read_excel(...).fillna("").astype(str) と同じ文字列にする (日付のみの列は除く)"""
+    if v is None:
+        return ""
+    if isinstance(v, str):
+        return "" if v in EXCEL_NA_VALUES else v
+    if isinstance(v, float):
+        if v != v:
+            return ""
+        return str(int(v)) if v.is_integer() else str(v)
+    return str(v)
+
+def grid_from_rows(rows, max_cols=None):
+    """行のイテレータからグリッドを作る。末尾の空行・空列は読み捨てる (途中の空行は行番号がずれるので残す)"""
+    data = []
+    width = 0
+    last_used = 0
+    for row in rows:
+        if max_cols is not None:
+            row = row[:max_cols]
+        vals = [cell_to_str(v) for v in row]
+        while vals and vals[-1] == "":
+            vals.pop()
+        data.append(vals)
+        if vals:
+            last_used = len(data)
+            width = max(width, len(vals))
+    del data[last_used:]
+    values = np.full((len(data), width), "", dtype=object)
+    for r, vals in enumerate(data):
+        values[r, :len(vals)] = vals
+    return _grid_from_values(values)
+
+def _open_openpyxl(content, **kwargs):
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        return openpyxl.load_workbook(io.BytesIO(content), read_only=True, keep_links=False, **kwargs)
+    except KeyError as e:  # zip ではあるが xlsx の構成になっていない
+        raise InvalidFileException(f"xlsx ではありません: {e}") from e
+
+def _iter_rows_openpyxl(content, max_cols=None, sheets=None):
+    wb = _open_openpyxl(content, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            if sheets is not None and ws.title not in sheets:
+                continue
+            ws.reset_dimensions()  # 書き出し元によっては dimension が不正確なので使わない
+            yield ws.title, list(ws.iter_rows(max_col=max_cols, values_only=True))
+    finally:
+        wb.close()
+
+def _iter_rows_calamine(content, max_cols=None, sheets=None):
+    from python_calamine import CalamineWorkbook
+    wb = CalamineWorkbook.from_filelike(io.BytesIO(content))
+    for name in wb.sheet_names:
+        if sheets is not None and name not in sheets:
+            continue
+        values = wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+        if max_cols is not None:
+            values = [row[:max_cols] for row in values]
+        yield name, values
+        del values  # 次のシートを読む前に手放す
+
+def resolve_reader(reader=None):
+    reader = reader or XLSX_READER
+    if reader == "auto":
+        reader = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+    return reader
+
+ROW_READERS = {"calamine": _iter_rows_calamine, "openpyxl": _iter_rows_openpyxl}
+
+def workbook_read_errors():
+    """xlsx でない・壊れたファイルを読んだときに読み込み方式が出す例外 (except に渡すタプル)"""
+    import zipfile
+    from openpyxl.utils.exceptions import InvalidFileException
+    errors = [zipfile.BadZipFile, InvalidFileException]
+    if importlib.util.find_spec("python_calamine"):
+        from python_calamine import CalamineError
+        errors.append(CalamineError)
+    return tuple(errors)
+
+def iter_workbook_rows(content, reader=None, max_cols=None, sheets=None):
+    """xlsx のバイト列からシートを1枚ずつ (シート名, 行のリスト) で返す (calamine / openpyxl のみ)。
+    前のシートの行は、呼び出し側が手放せば次のシートを読む前に捨てられる"""
+    reader = resolve_reader(reader)
+    if reader not in ROW_READERS:
+        raise ValueError(f"行単位の読み込みに対応していない読み込み方式です: {reader}")
+    return ROW_READERS[reader](content, max_cols, sheets)
+
+def read_workbook_rows(content, reader=None, max_cols=None, sheets=None):
+    """xlsx のバイト列から {シート名: 行のリスト (セルは読み込んだままの値)} を作る (calamine / openpyxl のみ)"""
+    return dict(iter_workbook_rows(content, reader, max_cols, sheets))
+
+# 解析コードが変わったら、セル値が同じシートでも前の版の結果を使い回さない (ディスクキャッシュから戻した版のため)
+with open(__file__, "rb") as _f:
+    PARSER_FINGERPRINT = hashlib.blake2b(_f.read(), digest_size=8).digest()
+
+def sheet_content_hash(rows):
+    """シートのセル値のハッシュ。値が同じなら (書式・共有文字列の並びが変わっても) 同じになる"""
+    h = hashlib.blake2b(PARSER_FINGERPRINT, digest_size=16)
+    h.update(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+    return h.hexdigest()
+
+def read_workbook_grids(content, reader=None, max_cols=None, sheets=None):
+    """xlsx のバイト列から {シート名: SheetGrid} を作る。
+
+    max_cols を指定すると各シートの先頭 max_cols 列だけを読む (行全体を見る判定があるので既定は無制限)。
+    sheets (シート名の集合) を指定するとそのシートだけを読む。
+    """
+    reader = resolve_reader(reader)
+    if reader in ROW_READERS:
+        return {name: grid_from_rows(rows) for name, rows in ROW_READERS[reader](content, max_cols, sheets)}
+    import pandas as pd
+    dfs = pd.read_excel(io.BytesIO(content), sheet_name=None if sheets is None else list(sheets), header=None)
+    if max_cols is not None:
+        dfs = {name: df.iloc[:, :max_cols] for name, df in dfs.items()}
+    return build_grids(dfs)
+
+def workbook_sheet_names(content, reader=None):
+    """シート名をブック内の並び順で返す (セルは読まない)"""
+    if resolve_reader(reader) == "calamine":
+        from python_calamine import CalamineWorkbook
+        return list(CalamineWorkbook.from_filelike(io.BytesIO(content)).sheet_names)
+    wb = _open_openpyxl(content)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+# --- セル分類 (道場名 / 選手名の判定) ---
+RE_JAPANESE = re.compile(r'[一-龥ぁ-んァ-ン]')
+RE_ALPHA = re.compile(r'[a-zA-Z]')
+RE_JP_SPACE_ALPHA = re.compile(r'[一-龥ぁ-んァ-ン]+[ \u3000]+[a-zA-Z]')
+RE_ALPHA_WORD = re.compile(r'^[A-Za-z]+$')
+BJJ_WORDS = frozenset({"GYM", "JIU", "JITSU", "JIUJITSU", "ACADEMY", "CLUB",
+                       "TEAM", "DIEM", "CARPE", "BOA", "SORTE", "FORCE",
+                       "TRIANGLE", "ALLIANCE", "GRACIE", "MMA", "BJJ",
+                       "ESCUDO", "IMPACTO", "SISU", "SEISHINKAN"})
+NON_DOJO_WORDS = frozenset({"集合時間", "計量", "試合開始", "Result", "優勝", "Winner",
+                            "カテゴリー", "Mat", "マット", "道着チェック", "欠場"})
+
+def has_japanese(text):
+    return RE_JAPANESE.search(text) is not None
+
+def has_alpha(text):
+    return RE_ALPHA.search(text) is not None
+
+def is_likely_player(text):
+    jp = has_japanese(text)
+    alpha = has_alpha(text)
+    # Pattern 1: 日本語＋英語混在 (e.g. "松本将樹 Masaki Matsumoto")
+    if jp and alpha:
+        return RE_JP_SPACE_ALPHA.search(text) is not None
+    # Pattern 2: 純英語の選手名 (e.g. "Jungwoo Lee", "Pedro Iamashita")
+    #   - 2〜4語の英字のみ単語
+    #   - タイトルケース（全大文字ではない）
+    #   - BJJ系キーワードやハイフンを含まない
+    if alpha and not jp:
+        words = text.split()
+        if 2 <= len(words) <= 4:
+            for w in words:
+                if not RE_ALPHA_WORD.match(w):      # ハイフン等を含む→道場名
+                    return False
+                if w == w.upper() and len(w) > 2:   # 全大文字→略称/組織名
+                    return False
+                if not w[0].isupper():              # 先頭大文字でない
+                    return False
+                if w.upper() in BJJ_WORDS:
+                    return False
+            return True
+    return False
+
+def is_likely_dojo(text):
+    # Dojos are usually either all Alpha (SCORPION GYM) or all Japanese (ねわざワールド)
+    # They rarely mix scripts in the same way, or at least we can assume if it's NOT a player format, it might be a dojo.
+    # Also exclude common keywords
+    if text in NON_DOJO_WORDS: return False
+
+    # Exclude if it looks like a player name (Japanese Space English)
+    if is_likely_player(text): return False
+    return True
+
+# is_dojo_candidate: 道場名になり得る (ID・時刻・キーワード・選手名ではない)
+# is_player       : 選手名らしい
+CellClass = namedtuple("CellClass", ["is_dojo_candidate", "is_player"])
+
+def classify_cell(val, cell_classes):
+    """文字列ごとの分類をメモ化して返す。ワークブックには同じ文字列が何度も現れるので、判定は1種類につき1回で済む"""
+    cls = cell_classes.get(val)
+    if cls is None:
+        player = is_likely_player(val)
+        dojo_candidate = (
+            len(val) >= 2 and not is_valid_id(val) and not has_time_pattern(val)
+            and not player and val not in NON_DOJO_WORDS
+        )
+        cls = cell_classes[val] = CellClass(dojo_candidate, player)
+    return cls
+
+def extract_all_dojos(grids, cell_classes=None):
+    dojo_set = set()
+    if cell_classes is None:
+        cell_classes = {}
+
+    for grid in grids.values():
+        cells = grid.cells
+        rows, cols = cells.shape
+        # Search more columns to ensure we catch dojos in later columns (e.g. col 5)
+        search_cols = min(20, cols)
+
+        for r in range(1, rows):
+            row = cells[r].tolist()
+            upper_row = cells[r-1].tolist()
+            for c in range(search_cols):
+                val = row[c]
+                if not classify_cell(val, cell_classes).is_dojo_candidate: continue
+
+                # Heuristic: If row above (r-1) is a Player, this row is likely a Dojo
+                if classify_cell(upper_row[c], cell_classes).is_player:
+                    dojo_set.add(val)
+
+    if not dojo_set:
+        # Fallback: if strict logic finds nothing, try looser logic (e.g. just row-1 is not category)
+        # But for now, returning empty is better than garbage.
+        # Let's add at least one check to avoid complete empty if possible.
+        pass
+
+    return sort_dojos(dojo_set)
+
+def sort_dojos(names):
+    def _sort_key(name):
+        # 先頭文字がASCII範囲外（日本語等）なら後ろのグループへ
+        is_jp = ord(name[0]) > 127 if name else True
+        return (is_jp, name.lower())
+
+    return sorted(list(names), key=_sort_key)
+
+def build_cell_index(grids, search_cols=20):
+    """セル値 → [(シート名, 行, 列), ...] の転置インデックス（ワークブック読み込み時に1回だけ作る）"""
+    cell_index = {}
+    for sheet_name, grid in grids.items():
+        values = grid.cells[:, :search_cols]
+        for r in range(values.shape[0]):
+            for c in range(values.shape[1]):
+                val = values[r, c]
+                if val:
+                    cell_index.setdefault(val, []).append((sheet_name, r, c))
+    return cell_index
+
+def get_mat_num(sheet_name):
+    normalized_sheet = unicodedata.normalize('NFKC', str(sheet_name))
+    mat_match = re.search(r'(\d+)', normalized_sheet)
+    return mat_match.group(1) if mat_match else "999"
+
+def resolve_match_entry(grid, r, c, target_dojo, mat_num):
+    """道場セル (r, c) から選手名・試合番号・開始時刻・カテゴリーを解決する。該当しなければ None"""
+    cells = grid.cells
+    rows, cols = cells.shape
+    if r <= 0:
+        return None
+    player_name = cells[r-1, c]
+    if not (player_name and player_name != "nan" and target_dojo not in player_name and len(player_name) >= 2):
+        return None
+    # 選手名として無効なキーワードはスキップ
+    INVALID_PLAYER_NAMES = {
+        "優勝", "準優勝", "3位", "試合開始", "欠場",
+        "道着チェック", "集合時間", "計量", "Result",
+        "Winner", "1回戦の敗者", "2回戦の敗者"
+    }
+    if player_name in INVALID_PLAYER_NAMES:
+        return None
+    # プレイヤー行に「計量」「集合」が含まれている場合は、試合行ではなくスケジュール行なのでスキップ
+    if grid.row_weigh[r-1] or grid.row_gather[r-1]:
+        return None
+
+    # Phase 1: 上下 -3〜+2 行 × 右 10 列の窓で、時刻/集合が現れる最も左の列 (barrier) より右の ID を探す
+    r0 = max(r - 3, 0); r1 = min(r + 3, rows); max_search_col_1 = min(c + 10, cols)
+    match_id = "-"; is_second_round = False; base_row_for_time = r
+    if window_count(grid.time_sat, r0, r1, c, max_search_col_1):
+        barrier_col = next(
+            check_c for check_c in range(c, max_search_col_1)
+            if window_count(grid.time_sat, r0, r1, check_c, check_c + 1)
+        )
+        barrier_row = r0 + int(np.argmax(grid.time_mask[r0:r1, barrier_col]))
+        id_c0 = max(c + 1, barrier_col)
+        if window_count(grid.id_sat, r0, r1, id_c0, max_search_col_1):
+            # 行優先で並ぶ候補のうち barrier 行に最も近いもの (同距離なら先に現れたもの)
+            id_rows, id_cols = np.nonzero(grid.id_mask[r0:r1, id_c0:max_search_col_1])
+            best = int(np.argmin(np.abs(id_rows + r0 - barrier_row)))
+            match_id = cells[r0 + id_rows[best], id_c0 + id_cols[best]]
+            base_row_for_time = barrier_row
+    t_s, t_k, t_b = "-", "-", "-"
+    if match_id != "-":
+        time_anchor = -1
+        for offset in range(-2, 3):
+            curr = base_row_for_time + offset
+            if 0 <= curr < rows:
+                if grid.row_gather[curr]:
+                    time_anchor = curr; break
+        target_r = time_anchor if time_anchor != -1 else base_row_for_time
+        if target_r < rows: t_s = grid.row_time[target_r]
+        if target_r + 1 < rows: t_k = grid.row_time[target_r + 1]
+        if target_r + 2 < rows: t_b = grid.row_time[target_r + 2]
+    # Phase 2: 見つからなければ上下 ±8 行 × 右 25 列の窓で、近くに時刻がある ID を探す (シード・2回戦以降)
+    if match_id == "-":
+        r0 = max(r - 8, 0); r1 = min(r + 9, rows); c0 = c + 1; c1 = min(c + 25, cols)
+        if window_count(grid.near_sat, r0, r1, c0, c1):
+            id_rows, id_cols = np.nonzero(grid.near_mask[r0:r1, c0:c1])
+            id_rows = id_rows + r0; id_cols = id_cols + c0
+            scores = np.abs(id_rows - r) * 1000 + id_cols
+            best = int(np.argmin(scores))
+            id_row = int(id_rows[best]); id_col = int(id_cols[best])
+            match_id = cells[id_row, id_col]
+            is_second_round = True
+            t_s, t_k, t_b = collect_times_vertical_strip(cells, id_row, id_col)
+    category = grid.row_category[r]
+    return {
+        "mat": mat_num, "name": player_name, "match_no": match_id,
+        "is_seed": is_second_round, "start_time": t_b, "category": category
+    }
+
+def _collect_hits(cell_index, dojos):
+    """対象道場のヒット位置をシートごとに (行, 列, 道場) の昇順でまとめる"""
+    hits_by_sheet = {}
+    for dojo in dojos:
+        for sheet_name, r, c in cell_index.get(dojo, []):
+            hits_by_sheet.setdefault(sheet_name, []).append((r, c, dojo))
+    for hits in hits_by_sheet.values():
+        hits.sort()
+    return hits_by_sheet
+
+def sheet_hits(grid, dojo_set, r0=0, r1=None, search_cols=20):
+    """行 r0〜r1-1 にある道場名セルを (行, 列, 道場) の昇順で返す (1シート分の _collect_hits)"""
+    values = grid.cells[r0:r1, :search_cols]
+    hits = []
+    for i in range(values.shape[0]):
+        for c in range(values.shape[1]):
+            val = values[i, c]
+            if val and val in dojo_set:
+                hits.append((r0 + i, c, val))
+    return hits
+
+# シート1枚分の解析結果。次の版でセル値が同じシートは、解析し直さずにこれを使う
+# content_hash: sheet_content_hash (行単位で読めない読み込み方式では None), dojos: そのシートの道場候補,
+# records: 試合表の行 (sheet_schedule_records)
+SheetResult = namedtuple("SheetResult", ["content_hash", "dojos", "records"])
+
+SCHEDULE_COLUMNS = ["dojo", "mat", "name", "match_no", "is_seed", "start_time", "category"]
+
+def sheet_schedule_records(sheet_name, grid, hits):
+    """1シート分のヒット (行, 列, 道場の昇順) から試合表の行 (dict) を作る。行どうしは独立"""
+    mat_num = get_mat_num(sheet_name)
+    results = []
+    matched_rows = set()  # (道場, 行): 1行につき最初に解決できたセルのみ採用
+    for r, c, dojo in hits:
+        if (dojo, r) in matched_rows:
+            continue
+        entry = resolve_match_entry(grid, r, c, dojo, mat_num)
+        if entry is not None:
+            results.append({"dojo": dojo, **entry})
+            matched_rows.add((dojo, r))
+    return results
+
+def get_all_schedule_data(grids, dojos, cell_index=None):
+    """全道場の試合表を1パスで作る。道場別の表示はこの表を dojo 列で絞り込むだけ"""
+    if cell_index is None:
+        cell_index = build_cell_index(grids)
+    hits_by_sheet = _collect_hits(cell_index, dojos)
+
+    results = []
+    for sheet_name, grid in grids.items():
+        hits = hits_by_sheet.get(sheet_name)
+        if hits:
+            results.extend(sheet_schedule_records(sheet_name, grid, hits))
+    return schedule_frame(results)
+
+def merge_sheet_results(results):
+    """シートごとの結果 (シート順の dict) を全道場の試合表にまとめる"""
+    return schedule_frame([record for result in results.values() for record in result.records])
+
+def schedule_frame(records):
+    """試合表の行 (シート順) を DataFrame にする"""
+    import pandas as pd
+    df_res = pd.DataFrame(records, columns=SCHEDULE_COLUMNS)
+    if not df_res.empty:
+        # 重複削除 (念のため dojo, mat, match_no, name, start_time で判定)
+        df_res = df_res.drop_duplicates(subset=['dojo', 'mat', 'match_no', 'name', 'start_time'])
+    return df_res.reset_index(drop=True)
+
+def filter_schedule(schedule_table, target_dojo):
+    """全道場の試合表から1道場分を取り出す (get_schedule_data と同じ列構成)"""
+    df = schedule_table[schedule_table["dojo"] == target_dojo]
+    return df.drop(columns="dojo").reset_index(drop=True)
+
+def filter_schedule_multi(schedule_table, dojos):
+    """複数道場分をまとめて取り出す (dojo 列は残す)。全道場の表は1回の走査で作ってあるので、道場数によらず1回の絞り込みで済む"""
+    df = schedule_table[schedule_table["dojo"].isin(dojos)]
+    return df.reset_index(drop=True)
+
+def get_schedule_data(grids, target_dojo, cell_index=None):
+    if cell_index is None:
+        cell_index = build_cell_index(grids)
+    df_res = get_all_schedule_data(grids, [target_dojo], cell_index)
+    if df_res.empty:
+        import pandas as pd
+        return pd.DataFrame()
+    return df_res.drop(columns="dojo")
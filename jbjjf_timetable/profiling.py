@@ -0,0 +1,177 @@
+"""必要なときだけ動くプロファイラ (本番で遅い表示の原因を調べる)
+
+1回の処理 (画面の再実行1回、ワークブックの解析1回) を計測し、PROFILE_DIR に2つのファイルを書き出す:
+
+    <時刻>_<ラベル>.prof       cProfile の統計 (python -m pstats / snakeviz で読む)
+    <時刻>_<ラベル>.collapsed  一定間隔で採取したスタックの集計 (flamegraph.pl / speedscope にそのまま渡せる)
+
+計測するかどうかは処理ごとに決める: forced=True (秘密のクエリパラメータなど) のときと、
+PROFILE_SAMPLE_RATE の確率に当たったとき。既定の割合は 0 なので、計測しない処理の負担は乱数1回だけ。
+
+計測はプロセス全体で同時に1つだけ。Python 3.12 以降の cProfile はプロセスに1つしか有効にできないため、
+他の計測 (別セッションの再実行や解析) の途中で当たった処理は計測せずにそのまま実行する。
+また 3.12 以降は .prof に計測中の他のスレッドの呼び出しも入る (.collapsed は計測したスレッドだけ)。
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "profiles"),
+)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))  # 自動で計測する処理の割合 (0〜1)
+PROFILE_PARSE = os.environ.get("PROFILE_PARSE", "0") == "1"  # 新しい版の解析を毎回計測する
+PROFILE_INTERVAL = 0.005   # スタックを採取する間隔 [秒]
+PROFILE_MAX_SECONDS = 120  # 終了が呼ばれなかったときに採取をやめるまでの時間
+PROFILE_KEEP = 50          # 残すプロファイルの数 (古いものから消す)
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def collapse_stack(frame, base=None):
+    """根から葉へ ; でつないだスタック。base (計測を始めたフレーム) より根元は省く"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        if frame is base:
+            break
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+# 計測中の Profile (プロセスで1つ)。終了が呼ばれないまま計測したスレッドが終わったもの、
+# PROFILE_MAX_SECONDS を過ぎたものは、次に計測を始めるときに止めて入れ替える
+_current = None
+_current_lock = threading.Lock()
+
+def _claim(profile):
+    global _current
+    with _current_lock:
+        stale = _current
+        if stale is not None and not stale.abandoned():
+            return False
+        _current = profile
+    if stale is not None:
+        stale.stop(save=False)
+    return True
+
+def _release(profile):
+    global _current
+    with _current_lock:
+        if _current is profile:
+            _current = None
+
+class Profile:
+    """呼び出したスレッドを cProfile で計測しつつ、別スレッドからスタックを採取する"""
+
+    def __init__(self, label, out_dir=None, interval=PROFILE_INTERVAL):
+        self.label = label
+        self.out_dir = out_dir or PROFILE_DIR
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def start(self, base=None):
+        """計測を始めて self を返す。他の計測が動いていれば何もせず None を返す"""
+        self.thread = threading.current_thread()
+        self.target = self.thread.ident
+        self.base = base if base is not None else sys._getframe(1)
+        self.started = time.time()
+        if not _claim(self):
+            return None
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:  # プロセスの外から別のプロファイラが有効にされている (3.12 以降)
+            _release(self)
+            return None
+        self.sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+        self.sampler.start()
+        return self
+
+    def abandoned(self):
+        return not self.thread.is_alive() or time.time() - self.started > PROFILE_MAX_SECONDS
+
+    def _sample(self):
+        deadline = time.perf_counter() + PROFILE_MAX_SECONDS
+        while not self._done.wait(self.interval) and time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                break
+            self.stacks[collapse_stack(frame, self.base)] += 1
+
+    def stop(self, save=True):
+        """計測を終え、save なら書き出したファイルのパスのリストを返す (2回目以降は何もしない)"""
+        if self._done.is_set():
+            return []
+        self._done.set()
+        self.profiler.disable()
+        self.sampler.join()
+        _release(self)
+        if not save:
+            return []
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        slug = re.sub(r"[^\w\-]+", "_", self.label)[:40].strip("_") or "run"
+        path = os.path.join(self.out_dir, f"{stamp}-{int(self.started * 1000) % 1000:03d}_{slug}")
+        self.profiler.dump_stats(f"{path}.prof")
+        with open(f"{path}.collapsed", "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        _remove_old(self.out_dir)
+        return [f"{path}.prof", f"{path}.collapsed"]
+
+def _remove_old(out_dir, keep=PROFILE_KEEP):
+    runs = sorted({os.path.splitext(f)[0] for f in os.listdir(out_dir) if f.endswith((".prof", ".collapsed"))})
+    for run in runs[:-keep]:
+        for ext in (".prof", ".collapsed"):
+            try:
+                os.remove(os.path.join(out_dir, run + ext))
+            except OSError:
+                pass
+
+def sampled(forced=False, rate=None):
+    rate = PROFILE_SAMPLE_RATE if rate is None else rate
+    return forced or (rate > 0 and random.random() < rate)
+
+@contextmanager
+def profile_section(label, forced=False, rate=None, out_dir=None):
+    """with ブロックを (当たったときだけ) 計測する。例外で抜けたときも途中までを書き出す"""
+    if not sampled(forced, rate):
+        yield None
+        return
+    profile = Profile(label, out_dir).start(sys._getframe(2))
+    if profile is None:
+        yield None
+        return
+    try:
+        yield profile
+    finally:
+        profile.stop()
+
+# --- 画面の再実行 (Streamlit のスクリプト) 用 ---
+# スクリプト全体を with で囲めないので、先頭で開始し末尾で終了する。st.rerun() などで末尾に
+# 届かなかった計測は、同じスレッドで次に開始するとき (スレッドが終わっていれば次の計測を始めるとき) に捨てる
+_active = {}  # スレッド ID → Profile
+
+def start_rerun_profile(label, forced=False, rate=None, out_dir=None):
+    stale = _active.pop(threading.get_ident(), None)
+    if stale is not None:
+        stale.stop(save=False)
+    if not sampled(forced, rate):
+        return None
+    profile = Profile(label, out_dir).start(sys._getframe(1))
+    if profile is not None:
+        _active[threading.get_ident()] = profile
+    return profile
+
+def finish_rerun_profile(save=True):
+    profile = _active.pop(threading.get_ident(), None)
+    return profile.stop(save) if profile is not None else []
@@ -0,0 +1,435 @@
+"""タイムテーブル HTML の生成 (Streamlit に依存しない)"""
+from html import escape
+
+# --- 帯色判定ロジック ---
+def get_belt_color(category_text):
+    text = str(category_text)
+    if "白帯" in text or "White" in text:
+        return "#e0e0e0" # 白
+    elif "青帯" in text or "Blue" in text:
+        return "#0055af" # 青
+    elif "紫帯" in text or "Purple" in text:
+        return "#6a0dad" # 紫
+    elif "茶帯" in text or "Brown" in text:
+        return "#654321" # 茶
+    elif "黒帯" in text or "Black" in text:
+        return "#333333" # 黒
+    elif "灰" in text or "Gray" in text:
+        return "#808080" # キッズ灰
+    elif "黄" in text or "Yellow" in text:
+        return "#ffd700" # キッズ黄
+    elif "橙" in text or "Orange" in text:
+        return "#ffa500" # キッズ橙
+    elif "緑" in text or "Green" in text:
+        return "#008000" # キッズ緑
+    else:
+        return "#ff4b4b" # デフォルト
+
+# --- HTML生成 ---
+# 現在時刻ラインはブラウザ側 (JST) で描くので、HTML はデータだけで決まる
+HEADER_HEIGHT = 40
+# 複数道場をまとめて表示するときの道場ごとの色 (選択順に割り当て)
+DOJO_PALETTE = ["#4dabf7", "#ffa94d", "#69db7c", "#f783ac", "#b197fc", "#ffd43b", "#3bc9db", "#ff8787"]
+
+def dojo_colors(dojos):
+    return {dojo: DOJO_PALETTE[i % len(DOJO_PALETTE)] for i, dojo in enumerate(dojos)}
+
+def generate_full_html(df, dojos=None):
+    """dojos に2つ以上渡すと (df に dojo 列が必要)、カードに道場名と道場ごとの色を付ける"""
+    import pandas as pd
+    if df.empty:
+        return "<div style='padding:20px; text-align:center;'>No matches found.</div>"
+    
+    def time_to_min(t_str):
+        try: h, m = map(int, t_str.split(':')); return h * 60 + m
+        except: return None
+    df['min_time'] = df['start_time'].apply(time_to_min)
+    df_valid = df.dropna(subset=['min_time']).copy()
+    if df_valid.empty: return "<div style='padding:20px; text-align:center;'>No valid match times found.</div>"
+
+    min_t = int(df_valid['min_time'].min()) - 30
+    max_t = int(df_valid['min_time'].max()) + 60
+    PX_PER_MIN = 2.2 
+    CARD_HEIGHT = 42 # カードの高さを圧縮
+    
+    # デザイン定義
+    css = f"""
+    <style>
+    /* 全体のフォントと背景 */
+    body {{
+        font-family: "Helvetica Neue", Arial, "Hiragino Kaku Gothic ProN", "Hiragino Sans", Meiryo, sans-serif;
+        margin: 0;
+        padding: 0;
+        background-color: #0e1117; 
+        color: #fafafa;
+    }}
+
+    /* タイムテーブル全体のラッパー */
+    .timetable-wrapper {{
+        display: flex;
+        flex-direction: row;
+        padding: 0;
+        background-color: #0e1117;
+        position: relative;
+        height: calc(100vh - 70px); /* ヘッダー分を引く */
+        overflow: auto;
+    }}
+
+    /* 左側の時間軸 */
+    .time-axis {{
+        width: 60px; /* 少し広げる */
+        flex-shrink: 0;
+        position: sticky; /* 横スクロール時に左端に固定 */
+        left: 0;
+        /* border-right: 1px solid #e0e0e0; */ /* 二重線になるので削除 */
+        margin-right: 4px; /* 時間ラベルと縦棒の間のスペース */
+        background: #0e1117;
+        z-index: 20; /* マット列の上に表示 */
+        margin-top: 40px; 
+    }}
+    .time-label {{
+        position: absolute;
+        width: 100%;
+        text-align: right;
+        padding-right: 2px;
+        font-size: 10px; /* 文字サイズ調整 */
+        color: #a0a0a0;
+        /* border-top: 1px solid #eee; */ /* 軸側の線は消す */
+        line-height: 1;
+        transform: translateY(-50%); 
+    }}
+
+    /* マットごとの列 */
+    .mat-column {{
+        width: 260px;
+        min-width: 260px;
+        flex-shrink: 0;
+        margin-right: 0; 
+        position: relative;
+        background-color: transparent;
+        display: flex;
+        flex-direction: column;
+        /* border-right: 1px solid #e0e0e0; */ /* ヘッダーの縦線削除のため削除 */
+    }}
+
+    /* マットヘッダー (スティッキー) */
+    .mat-header {{
+        text-align: center;
+        font-weight: bold;
+        padding: 0;
+        background-color: #0e1117; 
+        color: #fafafa;
+        position: sticky;
+        top: 0;
+        z-index: 40;
+        height: 40px;
+        line-height: 40px;
+        font-size: 14px;
+        /* box-shadow: 0 2px 4px rgba(0,0,0,0.1); シャドウ削除 */
+        border-bottom: 1px solid #414144; /* これが「緑の箇所の罫線」 */
+    }}
+
+    /* マット本体 (カード配置領域) */
+    .mat-body {{
+        position: relative;
+        background-color: #0e1117; 
+        margin-top: 0;
+        border-right: 1px solid #414144; /* ここに縦線を追加 */
+        flex-grow: 1;
+        /* グリッド線はdivで描画するため背景画像の指定は削除 */
+        background-image: none;
+    }}
+
+    /* グリッド線 */
+    .grid-line {{
+        position: absolute;
+        left: 0;
+        right: 0;
+        z-index: 1;
+        pointer-events: none;
+    }}
+    .grid-line-solid {{
+        border-top: 1px solid #414144;
+    }}
+    .grid-line-dashed {{
+        border-top: 1px dashed #414144;
+    }}
+
+    /* 試合カード */
+    .match-card {{
+        position: absolute;
+        background-color: #262730; /* ダークグレー */
+        border-radius: 2px; 
+        padding: 2px 6px;
+        box-shadow: none; /* シャドウなし */
+        overflow: hidden;
+        line-height: 1.1;
+        z-index: 10;
+        display: flex;
+        flex-direction: column;
+        justify-content: center;
+        border-left-width: 4px;
+        border-left-style: solid;
+        box-sizing: border-box;
+        transition: transform 0.1s ease;
+        /* 枠線はつけないか、薄くつける */
+        /* border: 1px solid #eee; */
+    }}
+    .match-card:hover {{
+        transform: translateY(-1px);
+        z-index: 30;
+        background-color: #363945;
+    }}
+    .match-card.card-front {{
+        background-color: #363945;
+        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.5);
+    }}
+
+    /* カード内のテキスト */
+    .card-time {{
+        color: #a0a0a0;
+        font-size: 10px; /* 小さく */
+        margin-bottom: 1px;
+    }}
+    .card-player {{
+        font-weight: bold;
+        font-size: 11px; /* 小さく */
+        color: #fafafa;
+        margin-bottom: 0px;
+        white-space: nowrap;
+        overflow: hidden;
+        text-overflow: ellipsis;
+    }}
+
+    /* 現在時刻ライン */
+    .current-time-line {{
+        position: absolute;
+        left: 0;
+        border-top: 2px solid #ff4b4b;
+        z-index: 999;
+        pointer-events: none;
+    }}
+    .current-time-badge {{
+        position: sticky;
+        left: 0;
+        background-color: #ff4b4b;
+        color: white;
+        padding: 2px 6px;
+        border-radius: 4px;
+        font-size: 12px;
+        font-weight: bold;
+        z-index: 1000;
+        transform: translateY(-50%);
+        display: inline-block;
+    }}
+    
+    /* Ensure clickability */
+    html, body {{
+        height: 100%;
+        margin: 0;
+        padding: 0;
+        background-color: transparent; /* Or match background */
+    }}
+    .timetable-wrapper {{
+        min-height: 100%;
+    }}
+    </style>
+    """
+
+    # mats を先に計算してコンテンツ幅を確定する
+    df_valid['mat_int'] = pd.to_numeric(df_valid['mat'], errors='coerce').fillna(999).astype(int)
+    mats = sorted(df_valid['mat_int'].unique())
+    TIME_AXIS_W = 60; MAT_MARGIN = 4; MAT_COL_W = 260
+    total_content_w = TIME_AXIS_W + MAT_MARGIN + len(mats) * MAT_COL_W
+
+    html_parts = [css, '<div class="timetable-wrapper">']
+
+    # 現在時刻ライン: 位置はスクリプトが min_t と PX_PER_MIN から計算する (範囲外なら非表示)
+    html_parts.append(
+        f'<div class="current-time-line" id="current-time-line" data-min-t="{min_t}" data-max-t="{max_t}" '
+        f'data-px-per-min="{PX_PER_MIN}" data-header-height="{HEADER_HEIGHT}" '
+        f'style="display: none; width: {total_content_w}px;">'
+        f'<div class="current-time-badge"></div>'
+        f'</div>'
+    )
+    
+    html_parts.append(f'<div class="time-axis" style="height: {(max_t - min_t) * PX_PER_MIN}px;">')
+    current_t = min_t - (min_t % 30)
+    while current_t <= max_t:
+        top_px = (current_t - min_t) * PX_PER_MIN
+        if top_px >= 0:
+            h = current_t // 60; m = current_t % 60
+            # xx:00 のみ表示
+            if m == 0:
+                label_html = f'<div class="time-label" style="top: {top_px}px;">{h:02d}:{m:02d}</div>'
+                html_parts.append(label_html)
+        current_t += 30
+    html_parts.append('</div>')
+    
+    # グリッド線の位置とスタイルを計算
+    grid_lines_html = []
+    g_t = min_t - (min_t % 30)
+    while g_t <= max_t:
+        top_px = (g_t - min_t) * PX_PER_MIN
+        if top_px >= 0:
+            m = g_t % 60
+            style_class = "grid-line-solid" if m == 0 else "grid-line-dashed"
+            grid_lines_html.append(f'<div class="grid-line {style_class}" style="top: {top_px}px;"></div>')
+        g_t += 30
+    grid_lines_str = "".join(grid_lines_html)
+
+    colors = dojo_colors(dojos) if dojos and len(dojos) > 1 and 'dojo' in df_valid.columns else None
+
+    for i, m in enumerate(mats):
+        mat_label = f"マット{m}" if m != 999 else "Other"
+        df_mat = df_valid[df_valid['mat_int'] == m].sort_values('min_time')
+        
+        # mat-column自体のボーダーは削除
+        html_parts.append(f'<div class="mat-column">')
+        
+        html_parts.append(f'<div class="mat-header">{mat_label}</div>')
+        
+        # 最初のカラムだけ左ボーダーを mat-body に追加
+        extra_style = "border-left: 1px solid #e0e0e0;" if i == 0 else ""
+        html_parts.append(f'<div class="mat-body" style="min-height: {(max_t - min_t) * PX_PER_MIN}px; {extra_style}">')
+        
+        # グリッド線を追加
+        html_parts.append(grid_lines_str)
+        
+        # 重なり判定用のカラム終了位置 (pixel) を保持するリスト
+        # indexがカラム位置(0=左端, 1=一段右, 2=二段右...)、値はそのカラムの埋まっている最後尾(bottom_px)
+        col_ends = [] 
+        
+        for _, row in df_mat.iterrows():
+            start_min = row['min_time']
+            top_px = (start_min - min_t) * PX_PER_MIN
+            height_px = CARD_HEIGHT
+            bottom_px = top_px + height_px
+            
+            # 配置可能なカラムを探す
+            target_col = -1
+            for col_idx, end_px in enumerate(col_ends):
+                # 既存のカラムで、top_px が end_px より下なら配置可能
+                # 少し遊びを持たせるなら top_px >= end_px - tolerance
+                if top_px >= end_px:
+                    target_col = col_idx
+                    col_ends[col_idx] = bottom_px
+                    break
+            
+            # 空きがなければ新しいカラムを追加
+            if target_col == -1:
+                target_col = len(col_ends)
+                col_ends.append(bottom_px)
+            
+            # スタイル決定 (階層が深くなるほど右にずらす)
+            # 1階層あたり20%ずらす
+            indent_pct = target_col * 20
+            left_pct = 2 + indent_pct
+            
+            # 幅は画面からはみ出さないように調整、かつ狭くなりすぎないように
+            # 右端をある程度揃えたいが、後ろのカラムが見えなくなるので
+            # widthは 96 - indent_pct とする（右端揃え）
+            # あるいは少し残す？
+            width_pct = 96 - indent_pct
+            
+            if width_pct < 20: width_pct = 20 # 最低幅保証
+            
+            z_index = 10 + target_col # 後ろのカラム（右側）ほど手前に表示
+            
+            # セルの値はそのまま HTML に埋め込まない
+            display_no = escape(str(row['match_no']).split()[0])
+            start_time = escape(str(row["start_time"]))
+            player = escape(str(row["name"]))
+            cat_text = str(row["category"])
+            belt_color = get_belt_color(cat_text)
+            
+            if colors:
+                # 左の帯色はそのまま、右端と道場名を道場の色にする
+                dojo_color = colors.get(row["dojo"], "#a0a0a0")
+                card_html = (
+                    f'<div class="match-card" data-base-z="{z_index}" onclick="bringToFront(this, event)" style="top: {top_px}px; height: {height_px}px; left: {left_pct}%; width: {width_pct}%; z-index: {z_index}; border-left-color: {belt_color}; border-right: 4px solid {dojo_color};" >'
+                    f'<div class="card-time">{start_time} <span style="color: {dojo_color}; font-weight: bold;">{escape(str(row["dojo"]))}</span></div>'
+                    f'<div class="card-player">#{display_no} {player}</div>'
+                    f'</div>'
+                )
+            else:
+                card_html = (
+                    f'<div class="match-card" data-base-z="{z_index}" onclick="bringToFront(this, event)" style="top: {top_px}px; height: {height_px}px; left: {left_pct}%; width: {width_pct}%; z-index: {z_index}; border-left-color: {belt_color};" >'
+                    f'<div class="card-time">{start_time}</div>'
+                    f'<div class="card-player">#{display_no} {player}</div>'
+                    f'</div>'
+                )
+            html_parts.append(card_html)
+        html_parts.append('</div></div>')
+    html_parts.append('</div>')
+    
+    html_parts.append('</div>')
+    
+    # iframe内でのクリックを検知してサイドバーを閉じるスクリプトを追加
+    html_parts.append("""
+    <script>
+    // 前面に出す処理
+    function bringToFront(card, e) {
+        e.stopPropagation(); // バブリング防止（サイドバー閉じ処理と競合しないよう）
+        var body = card.closest('.mat-body');
+        if (!body) return;
+        var allCards = body.querySelectorAll('.match-card');
+        // 一度全カードをリセット
+        allCards.forEach(function(c) {
+            var baseZ = parseInt(c.getAttribute('data-base-z') || '10');
+            c.style.zIndex = baseZ;
+            c.classList.remove('card-front');
+        });
+        // クリックされたカードを最前面へ
+        card.style.zIndex = 999;
+        card.classList.add('card-front');
+
+        // サイドバーも閉じる
+        notifyParentToClose(e);
+    }
+
+    function notifyParentToClose(e) {
+        if (window.parent && window.parent.closeStreamlitSidebar) {
+            window.parent.closeStreamlitSidebar();
+        }
+    }
+
+    // カード以外の場所クリックでリセット
+    document.addEventListener('click', function(e) {
+        if (!e.target.closest('.match-card')) {
+            document.querySelectorAll('.match-card').forEach(function(c) {
+                var baseZ = parseInt(c.getAttribute('data-base-z') || '10');
+                c.style.zIndex = baseZ;
+                c.classList.remove('card-front');
+            });
+            notifyParentToClose(e);
+        }
+    });
+
+    window.addEventListener('touchstart', notifyParentToClose, {passive: true, capture: true});
+
+    // 現在時刻ライン (JST)。サーバーの再実行なしで30秒ごとに動かす
+    function updateCurrentTimeLine() {
+        var line = document.getElementById('current-time-line');
+        if (!line) return;
+        var minT = parseFloat(line.dataset.minT);
+        var maxT = parseFloat(line.dataset.maxT);
+        var pxPerMin = parseFloat(line.dataset.pxPerMin);
+        var headerHeight = parseFloat(line.dataset.headerHeight);
+        var jst = new Date(Date.now() + 9 * 60 * 60 * 1000);
+        var h = jst.getUTCHours(), m = jst.getUTCMinutes();
+        var currentMin = h * 60 + m;
+        if (currentMin < minT || currentMin > maxT) {
+            line.style.display = 'none';
+            return;
+        }
+        line.style.top = ((currentMin - minT) * pxPerMin + headerHeight) + 'px';
+        line.firstElementChild.textContent = (h < 10 ? '0' : '') + h + ':' + (m < 10 ? '0' : '') + m;
+        line.style.display = '';
+    }
+    updateCurrentTimeLine();
+    setInterval(updateCurrentTimeLine, 30 * 1000);
+    </script>
+    """)
+    
+    return "".join(html_parts)
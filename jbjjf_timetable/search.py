@@ -0,0 +1,169 @@
+"""団体名・選手名の検索 (表記ゆれを吸収した部分一致)
+
+全角/半角・大文字/小文字・カタカナ/ひらがな・ヘボン式/訓令式ローマ字の違いを吸収するため、名前ごとに
+検索キー (正規化した文字列と、そのローマ字) を作り、問い合わせも同じキーにして部分一致で比べる。
+
+    index = build_dojo_search_index(snapshot.all_dojos)
+    search_dojos(index, "しゅう")             # 「シュウ」「SHU」「Syu」… を含む団体
+    players = build_player_index(snapshot.schedule_table)
+    search_players(players, snapshot.schedule_table, "takahashi")
+
+索引は版ごとに1回だけ作れば使い回せる (Streamlit 側では st.cache_resource で保持する)。
+"""
+import bisect
+import re
+import unicodedata
+from collections import namedtuple
+
+# --- 検索キー ---
+
+def _kana_table():
+    table = {}
+    rows = [
+        ("あいうえお", ""), ("かきくけこ", "k"), ("さしすせそ", "s"), ("たちつてと", "t"), ("なにぬねの", "n"),
+        ("はひふへほ", "h"), ("まみむめも", "m"), ("らりるれろ", "r"), ("がぎぐげご", "g"), ("ざじずぜぞ", "z"),
+        ("だぢづでど", "d"), ("ばびぶべぼ", "b"), ("ぱぴぷぺぽ", "p"), ("ぁぃぅぇぉ", ""),
+    ]
+    for kana, consonant in rows:
+        for ch, vowel in zip(kana, "aiueo"):
+            table[ch] = consonant + vowel
+    table.update({"や": "ya", "ゆ": "yu", "よ": "yo", "ゃ": "ya", "ゅ": "yu", "ょ": "yo",
+                  "わ": "wa", "ゎ": "wa", "を": "o", "ん": "n", "ゔ": "vu",
+                  "ぢ": "zi", "づ": "zu"})
+    return table
+
+KANA_ROMAJI = _kana_table()
+KANA_ROW_HEADS = "あかさたなはまやらわ"
+RE_SEARCH_NOISE = re.compile(r"[\s\-_・･.,/'\"()（）]+")
+
+def katakana_to_hiragana(text):
+    return "".join(chr(ord(ch) - 0x60) if "ァ" <= ch <= "ヶ" else ch for ch in text)
+
+def normalize_search_text(text):
+    """NFKC・小文字化・アクセント除去・カタカナ→ひらがな・空白や記号の除去"""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    # ラテン文字のアクセントだけ外す (濁点・半濁点は残す)
+    text = "".join(ch for ch in unicodedata.normalize("NFKD", text) if not "\u0300" <= ch <= "\u036f")
+    text = unicodedata.normalize("NFC", katakana_to_hiragana(text))
+    return RE_SEARCH_NOISE.sub("", text)
+
+def kana_to_romaji(text):
+    """ひらがなを訓令式寄りのローマ字にする (かな以外はそのまま)"""
+    out = []
+    sokuon = False
+    for ch in text:
+        if ch == "っ":
+            sokuon = True
+            continue
+        if ch == "ー":
+            continue
+        roma = KANA_ROMAJI.get(ch)
+        if roma is None:
+            out.append(ch); sokuon = False
+            continue
+        if ch in "ゃゅょ" and out and len(out[-1]) > 1 and out[-1].endswith("i"):
+            out[-1] = out[-1][:-1] + roma  # きゃ→kya, しゃ→sya
+            continue
+        if ch in "ぁぃぅぇぉ" and out and len(out[-1]) > 1:
+            out[-1] = out[-1][:-1] + roma
+            continue
+        if sokuon and roma[0] not in "aiueon":
+            roma = roma[0] + roma
+        sokuon = False
+        out.append(roma)
+    return "".join(out)
+
+def canonical_romaji(text):
+    """ヘボン式の綴りを訓令式に寄せる (shi→si, chi→ti, tsu→tu, ji→zi, fu→hu)"""
+    text = text.replace("tch", "tty")  # matcha→mattya (っち)
+    for a, b in (("sh", "sy"), ("ch", "ty"), ("ts", "t"), ("j", "zy"), ("f", "h")):
+        text = text.replace(a, b)
+    return re.sub(r"([stz])yi", r"\1i", text)
+
+def search_keys(text):
+    norm = normalize_search_text(text)
+    return norm, canonical_romaji(kana_to_romaji(norm))
+
+def dojo_initial(dojo):
+    """頭文字グループ: 英字は A〜Z、かなは行 (あ・か・さ…)、それ以外は「他」"""
+    norm = normalize_search_text(dojo)
+    if not norm:
+        return "他"
+    ch = norm[0]
+    if "a" <= ch <= "z":
+        return ch.upper()
+    if "0" <= ch <= "9":
+        return "#"
+    ch = unicodedata.normalize("NFKD", ch)[0]  # 濁点・半濁点を外す
+    if "ぁ" <= ch <= "ん":
+        return KANA_ROW_HEADS[bisect.bisect_right(KANA_ROW_HEADS, ch) - 1] if ch >= "あ" else "あ"
+    return "他"
+
+# --- 団体検索 ---
+
+def build_dojo_search_index(dojos):
+    """[(道場名, 正規化キー, ローマ字キー, 頭文字), ...]"""
+    return [(dojo, *search_keys(dojo), dojo_initial(dojo)) for dojo in dojos]
+
+def search_dojos(search_index, query):
+    """部分一致で絞り込む (元の並び順を保つ)"""
+    q_norm, q_romaji = search_keys(query)
+    if not q_norm:
+        return [entry[0] for entry in search_index]
+    return [
+        dojo for dojo, norm, romaji, _ in search_index
+        if q_norm in norm or (q_romaji and q_romaji in romaji)
+    ]
+
+def group_dojos_by_initial(search_index):
+    groups = {}
+    for dojo, _, _, initial in search_index:
+        groups.setdefault(initial, []).append(dojo)
+    # 並び: #, A〜Z, あ行〜わ行, 他
+    order = {g: i for i, g in enumerate("#ABCDEFGHIJKLMNOPQRSTUVWXYZ" + KANA_ROW_HEADS + "他")}
+    return {g: groups[g] for g in sorted(groups, key=order.get)}
+
+# --- 選手検索 ---
+# 日本語の氏名は2〜4文字が多いので trigram ではなく bigram を使う
+PLAYER_NGRAM = 2
+PLAYER_SEARCH_LIMIT = 50
+
+PlayerIndex = namedtuple("PlayerIndex", ["names", "keys", "rows", "grams"])
+
+def ngrams(text, n=PLAYER_NGRAM):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def build_player_index(schedule_table):
+    """選手名ごとの試合行と、検索キー (正規化・ローマ字) の n-gram → 選手 ID の索引"""
+    rows = {}
+    for i, name in enumerate(schedule_table["name"]):
+        rows.setdefault(name, []).append(i)
+    names = list(rows)
+    keys = [search_keys(name) for name in names]
+    grams = {}
+    for name_id, name_keys in enumerate(keys):
+        for key in name_keys:
+            for gram in ngrams(key):
+                grams.setdefault(gram, set()).add(name_id)
+    return PlayerIndex(names, keys, [rows[name] for name in names], grams)
+
+def _match_players(index, query_key):
+    """query_key を部分文字列に含む選手 ID (n-gram の積集合で候補を絞ってから確認)"""
+    if len(query_key) < PLAYER_NGRAM:
+        return {i for i, keys in enumerate(index.keys) if any(query_key in k for k in keys)}
+    postings = [index.grams.get(gram) for gram in ngrams(query_key)]
+    if not all(postings):
+        return set()
+    candidates = set.intersection(*sorted(postings, key=len))
+    return {i for i in candidates if any(query_key in k for k in index.keys[i])}
+
+def search_players(index, schedule_table, query, limit=PLAYER_SEARCH_LIMIT):
+    """選手名の部分一致 (漢字・かな・ローマ字)。試合表の該当行を返す"""
+    q_norm, q_romaji = search_keys(query)
+    if not q_norm:
+        return schedule_table.iloc[0:0]
+    ids = _match_players(index, q_norm)
+    if q_romaji and q_romaji != q_norm:
+        ids |= _match_players(index, q_romaji)
+    row_ids = sorted(r for i in ids for r in index.rows[i])
+    return schedule_table.iloc[row_ids[:limit]].reset_index(drop=True)
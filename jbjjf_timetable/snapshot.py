@@ -0,0 +1,258 @@
+"""ワークブック1版分の解析結果 (Snapshot) と、そのディスクキャッシュ"""
+import hashlib
+import importlib.metadata
+import io
+import json
+import os
+import pickle
+import re
+import time
+import urllib.parse
+import zipfile
+import zlib
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+from .metrics import METRICS
+from .parallel import PARSE_WORKERS, parse_sheets_parallel
+from .parser import (
+    PARSER_FINGERPRINT,
+    ROW_READERS,
+    SheetGrid,
+    SheetResult,
+    extract_all_dojos,
+    grid_from_rows,
+    merge_sheet_results,
+    iter_workbook_rows,
+    read_workbook_grids,
+    resolve_reader,
+    sheet_content_hash,
+    sheet_hits,
+    sheet_schedule_records,
+    sort_dojos,
+)
+
+DEFAULT_TITLE = "JBJJF Tournament"
+
+# ワークブック1版分の解析結果。content_hash が同じなら中身も同じ (下流のキャッシュキーに使う)
+# sheet_results: {シート名: SheetResult} (次の版でセル値が同じシートを解析し直さないため)
+# dojo_versions: {道場: その道場の試合行のハッシュ} (道場ごとのキャッシュは、これが変わったときだけ作り直す)
+Snapshot = namedtuple(
+    "Snapshot",
+    ["content_hash", "title", "grids", "all_dojos", "schedule_table", "sheet_results", "dojo_versions"],
+    defaults=(None, None),
+)
+EMPTY_SNAPSHOT = Snapshot(None, DEFAULT_TITLE, None, [], None)
+
+def extract_title(headers):
+    extracted_title = DEFAULT_TITLE
+    if "Content-Disposition" in headers:
+        cd = headers["Content-Disposition"]
+        matches = re.findall(r"filename\*=UTF-8''(.+)", cd)
+        if matches:
+            filename = urllib.parse.unquote(matches[0])
+        else:
+            matches_simple = re.findall(r'filename="(.+?)"', cd)
+            filename = matches_simple[0] if matches_simple else DEFAULT_TITLE
+        extracted_title = re.sub(r'\.xlsx$', '', filename, flags=re.IGNORECASE)
+    return extracted_title
+
+def workbook_content_hash(content):
+    """xlsx の中身のハッシュ。
+
+    書き出しのたびに変わる docProps/ (作成日時など) は除き、各パートの名前と展開後の中身の SHA-256 を取る
+    (CRC やサイズだけでは、衝突したときに古い解析結果を返してしまう)。ZIP として読めなければ本文全体の SHA-256。
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            h = hashlib.sha256()
+            for info in sorted(zf.infolist(), key=lambda i: i.filename):
+                if info.filename.startswith("docProps/"):
+                    continue
+                h.update(f"{info.filename}:{info.file_size};".encode())
+                with zf.open(info) as part:
+                    for chunk in iter(lambda: part.read(1 << 20), b""):
+                        h.update(chunk)
+            return h.hexdigest()
+    except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError):
+        return hashlib.sha256(content).hexdigest()
+
+def parse_sheets(content, previous=None, reader=None):
+    """シートごとに解析し、(grids, all_dojos, {シート名: SheetResult}) を返す。
+
+    previous (前の版の Snapshot) とセル値が同じシートは、グリッド・道場候補・試合表の行を前の版から使う。
+    ただし道場一覧が増減したときは、増減した道場名を含むシートの試合表の行だけ作り直す。
+    """
+    reader = resolve_reader(reader)
+    prev_results = (previous.sheet_results or {}) if previous is not None else {}
+    with METRICS.timer("read"):
+        if reader in ROW_READERS:
+            # 1シートずつ読んでハッシュ・グリッドを作り、行は次のシートを読む前に手放す
+            hashes, reused, grids = {}, set(), {}
+            for name, rows in iter_workbook_rows(content, reader):
+                hashes[name] = sheet_content_hash(rows)
+                if name in prev_results and prev_results[name].content_hash == hashes[name]:
+                    reused.add(name)
+                    grids[name] = previous.grids[name]
+                else:
+                    grids[name] = grid_from_rows(rows)
+                del rows
+        else:
+            grids = read_workbook_grids(content, reader)
+            hashes = dict.fromkeys(grids)
+            reused = set()
+
+    with METRICS.timer("extract_all_dojos"):
+        cell_classes = {}
+        sheet_dojos = {
+            name: prev_results[name].dojos if name in reused else extract_all_dojos({name: grid}, cell_classes)
+            for name, grid in grids.items()
+        }
+        all_dojos = sort_dojos(set().union(*sheet_dojos.values()))
+
+    with METRICS.timer("get_schedule_data"):
+        changed_dojos = set(all_dojos) ^ set(previous.all_dojos) if reused else set()
+        dojo_set = set(all_dojos)
+        results = {}
+        for name, grid in grids.items():
+            if name in reused and not (changed_dojos and sheet_hits(grid, changed_dojos)):
+                records = prev_results[name].records
+            else:
+                records = sheet_schedule_records(name, grid, sheet_hits(grid, dojo_set))
+            results[name] = SheetResult(hashes[name], sheet_dojos[name], records)
+
+    METRICS.inc("sheets_parsed", len(grids) - len(reused))
+    METRICS.inc("sheets_reused", len(reused))
+    return grids, all_dojos, results
+
+def dojo_row_versions(schedule_table):
+    """道場ごとの試合行 (filter_schedule の結果) のハッシュ"""
+    if schedule_table is None or schedule_table.empty:
+        return {}
+    import pandas as pd
+    row_hashes = pd.util.hash_pandas_object(schedule_table, index=False).to_numpy()
+    return {
+        dojo: hashlib.blake2b(row_hashes[rows].tobytes(), digest_size=8).hexdigest()
+        for dojo, rows in schedule_table.groupby("dojo", sort=False).indices.items()
+    }
+
+def dojo_version(snapshot, dojo):
+    """道場の試合行の版。行が変わらなければワークブックの版が変わっても同じ (古いキャッシュにはないのでワークブックの版で代用)"""
+    if snapshot.dojo_versions is None:
+        return snapshot.content_hash
+    return snapshot.dojo_versions.get(dojo, "")
+
+def parse_workbook(content, title, content_hash, workers=None, previous=None, reader=None):
+    # 文字列グリッド・道場一覧・全道場の試合表はワークブック読み込み時に1回だけ作る
+    # (previous があればセル値の変わったシートだけ解析し直す)
+    workers = PARSE_WORKERS if workers is None else workers
+    parsed = None
+    if workers > 1:
+        try:
+            with METRICS.timer("parse_parallel"):
+                parsed = parse_sheets_parallel(content, workers, reader, previous=previous)
+        except BrokenProcessPool:
+            pass  # ワーカーが落ちたら直列でやり直す
+    if parsed is None:
+        parsed = parse_sheets(content, previous, reader)
+    grids, all_dojos, results = parsed
+    with METRICS.timer("schedule_frame"):
+        schedule_table = merge_sheet_results(results)
+    return Snapshot(
+        content_hash, title, grids, all_dojos, schedule_table, results, dojo_row_versions(schedule_table)
+    )
+
+# --- ディスクキャッシュ (再起動直後でも前回の版をすぐ表示する) ---
+SNAPSHOT_CACHE_DIR = os.environ.get(
+    "SNAPSHOT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "snapshots"),
+)
+SNAPSHOT_CACHE_KEEP = 3
+
+def _code_fingerprint():
+    h = hashlib.blake2b(PARSER_FINGERPRINT, digest_size=8)
+    for module in ("parallel.py", "snapshot.py"):
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as f:
+            h.update(f.read())
+    # pickle は pandas / numpy の内部クラスを参照するので、版が変われば読み込めないことがある
+    for package in ("pandas", "numpy"):
+        try:
+            h.update(f"{package}={importlib.metadata.version(package)};".encode())
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return h.hexdigest()
+
+# 解析コードの版。保存時と違えば (デプロイで解析が変わったら) 保存済みの版は使わない
+SNAPSHOT_CODE_VERSION = _code_fingerprint()
+
+def write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def save_snapshot(snapshot, etag=None, last_modified=None, cache_dir=None):
+    """Snapshot を content_hash 名のファイルに保存し、latest.json をそれに向ける"""
+    cache_dir = cache_dir or SNAPSHOT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    # クラスは再実行のたびに作り直されるので、素の dict / tuple / ndarray / DataFrame だけを保存する
+    payload = {
+        "code_version": SNAPSHOT_CODE_VERSION,
+        "content_hash": snapshot.content_hash,
+        "title": snapshot.title,
+        "grids": {name: grid._asdict() for name, grid in snapshot.grids.items()},
+        "all_dojos": snapshot.all_dojos,
+        "schedule_table": snapshot.schedule_table,
+        "sheet_results": {name: tuple(result) for name, result in (snapshot.sheet_results or {}).items()},
+        "dojo_versions": snapshot.dojo_versions,
+    }
+    write_atomic(
+        os.path.join(cache_dir, f"{snapshot.content_hash}.pkl"),
+        pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL),
+    )
+    latest = {
+        "content_hash": snapshot.content_hash, "etag": etag, "last_modified": last_modified,
+        "saved_at": time.time(), "code_version": SNAPSHOT_CODE_VERSION,
+    }
+    write_atomic(os.path.join(cache_dir, "latest.json"), json.dumps(latest).encode())
+
+    # 古い版は最新の数件だけ残す
+    files = sorted(
+        (os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith(".pkl")),
+        key=os.path.getmtime, reverse=True,
+    )
+    for old in files[SNAPSHOT_CACHE_KEEP:]:
+        os.remove(old)
+
+def load_cached_snapshot(cache_dir=None):
+    """保存済みの最新 Snapshot と、そのときの ETag / Last-Modified を返す。なければ (None, {})
+
+    解析コードの版が違う保存は、ETag ごと捨てる (304 や同じ本文のハッシュで古い解析結果を返さないため)。
+    """
+    cache_dir = cache_dir or SNAPSHOT_CACHE_DIR
+    try:
+        with open(os.path.join(cache_dir, "latest.json"), encoding="utf-8") as f:
+            latest = json.load(f)
+        if latest.get("code_version") != SNAPSHOT_CODE_VERSION:
+            return None, {}
+        with open(os.path.join(cache_dir, f"{latest['content_hash']}.pkl"), "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("content_hash") != latest["content_hash"] or payload.get("code_version") != SNAPSHOT_CODE_VERSION:
+            return None, {}
+        grids = {}
+        for name, fields in payload["grids"].items():
+            if not isinstance(fields, dict) or set(fields) != set(SheetGrid._fields):
+                return None, {}  # 古い形式のキャッシュは使わない
+            for arr in fields.values():
+                arr.flags.writeable = False
+            grids[name] = SheetGrid(**fields)
+        snapshot = Snapshot(
+            payload["content_hash"], payload["title"], grids, payload["all_dojos"], payload["schedule_table"],
+            {name: SheetResult(*result) for name, result in payload.get("sheet_results", {}).items()} or None,
+            payload.get("dojo_versions"),
+        )
+    except Exception:
+        # 壊れたファイルに加え、別の版の pandas / numpy で保存した pickle は ModuleNotFoundError・
+        # AttributeError・TypeError などで読めない。どれも保存がなかったものとして取得し直す
+        return None, {}
+    return snapshot, latest
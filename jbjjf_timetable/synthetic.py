@@ -0,0 +1,167 @@
+"""合成ワークブックの生成 (ベンチマーク・回帰テスト用)
+
+実際の大会シートと同じトーナメント表のレイアウトで、マット数・道場数・出場者数・列数を指定して xlsx を作る。
+1マット = 1シートで、カテゴリーごとに次のブロックが縦に並ぶ:
+
+    カテゴリー見出し (… 帯 …)
+    選手A
+    道場A    [集合時刻]  [試合番号]
+    選手B    [計量時刻]
+    道場B    [開始時刻]
+    (シード選手は右側の2回戦の試合番号と、その左の列の時刻に結び付く)
+
+同じ引数 (seed を含む) からは常に同じセル値のワークブックができる。
+"""
+import io
+import random
+
+SURNAMES = [
+    ("松本", "Matsumoto"), ("田中", "Tanaka"), ("佐藤", "Sato"), ("鈴木", "Suzuki"), ("高橋", "Takahashi"),
+    ("伊藤", "Ito"), ("渡辺", "Watanabe"), ("山本", "Yamamoto"), ("中村", "Nakamura"), ("小林", "Kobayashi"),
+    ("加藤", "Kato"), ("吉田", "Yoshida"), ("山田", "Yamada"), ("佐々木", "Sasaki"), ("井上", "Inoue"),
+    ("木村", "Kimura"), ("清水", "Shimizu"), ("林", "Hayashi"), ("斎藤", "Saito"), ("森", "Mori"),
+]
+GIVEN_NAMES = [
+    ("将樹", "Masaki"), ("太郎", "Taro"), ("花子", "Hanako"), ("健", "Ken"), ("翔", "Sho"), ("結衣", "Yui"),
+    ("蓮", "Ren"), ("陽菜", "Hina"), ("大輝", "Daiki"), ("美咲", "Misaki"), ("拓海", "Takumi"), ("葵", "Aoi"),
+    ("悠真", "Yuma"), ("さくら", "Sakura"), ("颯", "Hayate"), ("凛", "Rin"),
+]
+FOREIGN_NAMES = [
+    "Pedro Iamashita", "Jungwoo Lee", "Lucas Silva", "Rafael Costa", "John Smith", "Kevin Park",
+    "Bruno Alves", "Marcus Brown", "Diego Santos", "Ivan Petrov",
+]
+DOJO_STEMS_JP = [
+    "ねわざ", "トライフォース", "ポゴナ", "リバーサル", "パラエストラ", "ストライプル", "ブルテリア", "和術",
+    "グラップリング", "ボンサイ", "アクシス", "ハイブリッド", "トイカツ", "スクランブル", "かたなぎ", "さくら",
+]
+DOJO_SUFFIXES_JP = ["ワールド", "柔術アカデミー", "クラブ", "道場", "柔術", "ジム"]
+DOJO_STEMS_EN = [
+    "SCORPION", "CARPE DIEM", "IMPACTO", "X-TREME", "AXIS", "CLOSE GUARD", "ALLIANCE", "GRACIE BARRA",
+    "BONSAI", "SISU", "TRIANGLE", "ESCUDO", "BOA SORTE", "NOVA UNIAO", "CHECKMAT", "TEAM REGRA",
+]
+DOJO_SUFFIXES_EN = ["GYM", "JAPAN", "BJJ", "ACADEMY", "TOKYO", "OSAKA"]
+BELTS = [("白帯", "White"), ("青帯", "Blue"), ("紫帯", "Purple"), ("茶帯", "Brown"), ("黒帯", "Black"),
+         ("灰帯", "Gray"), ("黄帯", "Yellow"), ("橙帯", "Orange"), ("緑帯", "Green")]
+DIVISIONS = ["アダルト", "マスター1", "マスター2", "マスター3", "ジュブナイル", "キッズ"]
+WEIGHTS = ["-57.5kg", "-64.0kg", "-70.0kg", "-76.0kg", "-82.3kg", "-88.3kg", "-94.3kg", "+94.3kg", "無差別"]
+BRACKET_NOISE = ["優勝", "準優勝", "Winner", "Result", "1回戦の敗者", "-", "•", "No", "道着チェック"]
+
+
+def make_dojo_names(count, rng):
+    """重複しない道場名を count 個作る (日本語と英字を半々)"""
+    names = []
+    seen = set()
+    while len(names) < count:
+        if len(names) % 2 == 0:
+            name = rng.choice(DOJO_STEMS_JP) + rng.choice(DOJO_SUFFIXES_JP)
+        else:
+            name = f"{rng.choice(DOJO_STEMS_EN)} {rng.choice(DOJO_SUFFIXES_EN)}"
+        if name in seen:
+            # 組み合わせを使い切ったら番号を付ける
+            name = f"{name} {len(names) + 1}" if name.isascii() else f"{name}{len(names) + 1}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def make_player_name(rng):
+    """「漢字氏名 Romaji Name」が大半、一部は英字のみ"""
+    if rng.random() < 0.1:
+        return rng.choice(FOREIGN_NAMES)
+    (sur, sur_r), (given, given_r) = rng.choice(SURNAMES), rng.choice(GIVEN_NAMES)
+    return f"{sur}{given} {given_r} {sur_r}"
+
+
+def _fmt(minutes):
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+class _Sheet:
+    """行・列を指定して書き込み、最後に行のリストとして取り出す"""
+
+    def __init__(self, width):
+        self.width = width
+        self.rows = []
+
+    def set(self, r, c, value):
+        while len(self.rows) <= r:
+            self.rows.append([None] * self.width)
+        if c < self.width:
+            self.rows[r][c] = value
+
+
+def _write_mat(sheet, mat, entrants, dojos, rng, start_min, bracket_size, noise):
+    """1マット分のブロックを書き込み、マット内の試合数を返す"""
+    r = 0
+    sheet.set(r, 0, f"マット{mat} 試合順")
+    r += 2
+    clock = start_min
+    match_no = 1
+    remaining = entrants
+    while remaining > 0:
+        n = min(remaining, rng.randint(*bracket_size))
+        remaining -= n
+        belt, belt_en = rng.choice(BELTS)
+        sheet.set(r, 0, f"{rng.choice(DIVISIONS)} {belt} {rng.choice(WEIGHTS)} / {belt_en}")
+        if rng.random() < 0.5:
+            sheet.set(r, 3, "Weight")
+        if rng.random() < 0.3:
+            sheet.set(r, 6, "集合時間 / 計量 / 試合開始")
+        r += 1
+        c0 = rng.choice([0, 1, 2])
+        # 2のべき乗に足りない分はシード (1回戦なし)
+        seeds = (1 << max(n - 1, 1).bit_length()) - n if n > 2 else 0
+        pairs = (n - seeds) // 2
+        for _ in range(pairs):
+            a, b = make_player_name(rng), make_player_name(rng)
+            sheet.set(r, c0, a); sheet.set(r + 1, c0, rng.choice(dojos))
+            sheet.set(r + 2, c0, b); sheet.set(r + 3, c0, rng.choice(dojos))
+            match_id = match_no if rng.random() < 0.7 else f"{mat}-{match_no}"
+            sheet.set(r + 1, c0 + 3, float(match_id) if isinstance(match_id, int) and rng.random() < 0.2 else match_id)
+            sheet.set(r + 1, c0 + 2, _fmt(clock - 15))
+            sheet.set(r + 2, c0 + 2, _fmt(clock - 10))
+            sheet.set(r + 3, c0 + 2, _fmt(clock))
+            if rng.random() < noise:
+                sheet.set(r + rng.randint(0, 3), c0 + rng.randint(5, sheet.width), rng.choice(BRACKET_NOISE))
+            match_no += 1
+            clock += rng.choice([6, 8, 10])
+            r += 5
+        for _ in range(seeds):
+            sheet.set(r, c0, make_player_name(rng)); sheet.set(r + 1, c0, rng.choice(dojos))
+            id_col = c0 + rng.choice([8, 10, 12])
+            sheet.set(r + 1, id_col, match_no)
+            sheet.set(r + 1, id_col - 1, _fmt(clock - 15))
+            sheet.set(r + 2, id_col - 1, _fmt(clock - 10))
+            sheet.set(r + 3, id_col - 1, _fmt(clock))
+            match_no += 1
+            clock += rng.choice([6, 8, 10])
+            r += 5
+        if n >= 2:
+            sheet.set(r, c0 + 10, "優勝")
+        r += rng.choice([2, 3])
+    return match_no - 1
+
+
+def make_workbook(mats=4, dojos=40, entrants=120, width=30, seed=0,
+                  bracket_size=(2, 8), noise=0.05, title="合成大会"):
+    """合成ワークブックを xlsx のバイト列で返す
+
+    mats: マット (シート) 数, dojos: 道場数, entrants: 1マットあたりの出場者数,
+    width: シートの列数 (右側にはトーナメント表の注記がまばらに入る)
+    """
+    import openpyxl
+
+    rng = random.Random(seed)
+    dojo_names = make_dojo_names(dojos, rng)
+    wb = openpyxl.Workbook(write_only=True)
+    wb.properties.title = title
+    for mat in range(1, mats + 1):
+        sheet = _Sheet(width)
+        _write_mat(sheet, mat, entrants, dojo_names, rng, 9 * 60 + rng.choice([0, 15, 30]), bracket_size, noise)
+        ws = wb.create_sheet(f"マット{mat}" if mat % 3 else f"Mat {mat}")
+        for row in sheet.rows:
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
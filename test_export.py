@@ -0,0 +1,241 @@
+"""
+静的書き出しのテスト: 道場ごとの HTML / JSON フィードの差分書き出しと、CLI (export・読み込みエラー)
+
+実行方法:
+    python test_export.py
+"""
+
+import importlib.util
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import warnings
+import zipfile
+from contextlib import redirect_stderr, redirect_stdout
+
+from jbjjf_timetable.cli import main as cli_main
+from jbjjf_timetable.export import build_tournament_feed, dojo_slug, export_json_feeds, export_static_timetables
+from jbjjf_timetable.snapshot import parse_workbook, workbook_content_hash
+from jbjjf_timetable.synthetic import make_workbook
+
+warnings.filterwarnings("ignore")
+
+RENAMED_DOJO = "差し替えテスト道場"
+ODD_DOJO = "</script><b>記号&道場"
+
+# ──────────────────────────────────────────────
+# テストユーティリティ
+# ──────────────────────────────────────────────
+
+PASS_COUNT = 0
+FAIL_COUNT = 0
+
+def check(label, condition, detail=""):
+    global PASS_COUNT, FAIL_COUNT
+    if condition:
+        print(f"  ✅ PASS  {label}")
+        PASS_COUNT += 1
+    else:
+        print(f"  ❌ FAIL  {label}")
+        if detail:
+            print(f"           → {detail}")
+        FAIL_COUNT += 1
+
+
+def rename_dojo(raw, old, new):
+    """(書き換え前, 全シートの道場名 old を new に差し替えたもの) を返す (どちらも openpyxl で保存し直す)"""
+    import openpyxl
+
+    def save(wb):
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+
+    wb = openpyxl.load_workbook(io.BytesIO(raw))
+    before = save(wb)
+    for ws in wb.worksheets:
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value == old:
+                    cell.value = new
+    return before, save(wb)
+
+
+def snapshot_of(content, title="テスト大会", previous=None):
+    return parse_workbook(content, title, workbook_content_hash(content), workers=1, previous=previous)
+
+
+def inodes(out_dir):
+    return {name: os.stat(os.path.join(out_dir, name)).st_ino for name in os.listdir(out_dir)}
+
+
+def same_tree(a, b):
+    if sorted(os.listdir(a)) != sorted(os.listdir(b)):
+        return False
+    for name in os.listdir(a):
+        with open(os.path.join(a, name), "rb") as fa, open(os.path.join(b, name), "rb") as fb:
+            if fa.read() != fb.read():
+                return False
+    return True
+
+# ──────────────────────────────────────────────
+# テスト定義
+# ──────────────────────────────────────────────
+
+def check_incremental_export():
+    """E1: 同じ版は書き出さず、版が変わったら変わった道場のファイルだけ書き直して古い道場のファイルを消す"""
+    raw = make_workbook(mats=3, dojos=12, entrants=30, width=20, seed=7)
+    v1 = snapshot_of(raw)
+    victim = v1.all_dojos[0]
+    before, after = rename_dojo(raw, victim, RENAMED_DOJO)
+    v1 = snapshot_of(before)
+    v2 = snapshot_of(after, previous=v1)
+
+    for kind, export, suffix in (
+        ("HTML", export_static_timetables, ".html"),
+        ("JSON", export_json_feeds, ".json"),
+    ):
+        print(f"\n[E1] 差分書き出し ({kind})")
+        out_dir = tempfile.mkdtemp()
+        check("初回は書き出す", export(v1, out_dir) is True)
+        check("道場ごとのファイルがそろう",
+              all(os.path.exists(os.path.join(out_dir, dojo_slug(d) + suffix)) for d in v1.all_dojos))
+        first = inodes(out_dir)
+        check("同じ版は書き出さない", export(v1, out_dir) is False)
+        check("同じ版ではファイルに触れない", inodes(out_dir) == first)
+
+        check("新しい版は書き出す", export(v2, out_dir) is True)
+        now = inodes(out_dir)
+        old_file, new_file = dojo_slug(victim) + suffix, dojo_slug(RENAMED_DOJO) + suffix
+        check("なくなった道場のファイルを消す", old_file not in now)
+        check("増えた道場のファイルを書き出す", new_file in now)
+        unchanged = [
+            dojo_slug(d) + suffix for d in v2.all_dojos
+            if d in v1.all_dojos and v2.dojo_versions[d] == v1.dojo_versions[d]
+        ]
+        rewritten = [name for name in unchanged if now[name] != first[name]]
+        check("試合行の変わらない道場のファイルは書き直さない", unchanged and not rewritten,
+              f"{len(rewritten)} / {len(unchanged)} 件を書き直した")
+
+        full = tempfile.mkdtemp()
+        export(v2, full, force=True)
+        check("差分で書き出した結果が、まとめて書き出した結果と同じ", same_tree(out_dir, full))
+
+
+def check_cli_export():
+    """E2: python -m jbjjf_timetable export FILE.xlsx OUTDIR"""
+    print("\n[E2] CLI の export")
+    work = tempfile.mkdtemp()
+    path = os.path.join(work, "春季大会.xlsx")
+    with open(path, "wb") as f:
+        f.write(make_workbook(mats=2, dojos=8, entrants=16, width=20, seed=3))
+    out_dir = os.path.join(work, "out")
+
+    def run(*args):
+        buf = io.StringIO()
+        with redirect_stdout(buf):
+            code = cli_main(["export", path, out_dir, *args])
+        return code, json.loads(buf.getvalue())
+
+    code, doc = run()
+    check("終了コード 0", code == 0)
+    check("大会名はファイル名から取る", doc["title"] == "春季大会", doc["title"])
+    check("HTML と JSON フィードを書き出す", doc["written"] == {"timetable": True, "feed": True}, f"{doc}")
+    with open(os.path.join(out_dir, "feed", "tournament.json"), encoding="utf-8") as f:
+        feed = json.load(f)
+    check("tournament.json に全道場が載る", len(feed["dojos"]) == doc["dojos"] > 0)
+    check("index.html を書き出す", os.path.exists(os.path.join(out_dir, "timetable", "index.html")))
+
+    code, doc = run()
+    check("同じファイルの2回目は書き出さない", doc["written"] == {"timetable": False, "feed": False}, f"{doc}")
+    code, doc = run("--force")
+    check("--force なら書き直す", doc["written"] == {"timetable": True, "feed": True}, f"{doc}")
+
+
+def check_cli_unreadable_file():
+    """E3: xlsx でない・壊れたファイルは、読み込み方式によらず「読み込めません」で終了コード 1"""
+    print("\n[E3] CLI の読み込みエラー")
+    work = tempfile.mkdtemp()
+    bad_files = {
+        "xlsx でない": b"not a workbook",
+        "壊れた zip": b"PK\x03\x04broken",
+    }
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("readme.txt", "x")
+    bad_files["xlsx の構成でない zip"] = buf.getvalue()
+
+    readers = ["openpyxl"] + (["calamine"] if importlib.util.find_spec("python_calamine") else [])
+    for label, content in bad_files.items():
+        path = os.path.join(work, "bad.xlsx")
+        with open(path, "wb") as f:
+            f.write(content)
+        for reader in readers:
+            for command in (["dojos", path], ["export", path, os.path.join(work, "out")]):
+                err = io.StringIO()
+                with redirect_stderr(err), redirect_stdout(io.StringIO()):
+                    code = cli_main(["--reader", reader, *command])
+                check(f"{label} ({reader}, {command[0]})",
+                      code == 1 and err.getvalue().startswith("読み込めません"), err.getvalue().strip())
+
+
+def check_dojo_links():
+    """E4: アプリと同じ ?dojo=<道場名> から道場のページをたどれる (dojos.json と index.html の転送)"""
+    print("\n[E4] 道場名からのリンク")
+    raw = make_workbook(mats=2, dojos=8, entrants=16, width=20, seed=5)
+    victim = snapshot_of(raw).all_dojos[0]
+    _, after = rename_dojo(raw, victim, ODD_DOJO)
+    v = snapshot_of(after)
+    out_dir = tempfile.mkdtemp()
+    export_static_timetables(v, out_dir)
+
+    with open(os.path.join(out_dir, "dojos.json"), encoding="utf-8") as f:
+        slugs = json.load(f)
+    check("dojos.json に全道場が載る", list(slugs) == v.all_dojos)
+    check("dojos.json の slug のページがある",
+          all(os.path.exists(os.path.join(out_dir, f"{slug}.html")) for slug in slugs.values()))
+    check("tournament.json の対応表と同じ", build_tournament_feed(v)["dojos"] == slugs)
+
+    with open(os.path.join(out_dir, "index.html"), encoding="utf-8") as f:
+        index = f.read()
+    embedded = re.search(r"var slugs = (.*?);\n", index)
+    check("index.html に転送用の対応表を埋め込む", embedded and json.loads(embedded.group(1)) == slugs)
+    check("道場名で <script> を閉じない", index.count("</script>") == 1 and ODD_DOJO not in index)
+
+# ──────────────────────────────────────────────
+# メイン
+# ──────────────────────────────────────────────
+
+def run_all():
+    check_incremental_export()
+    check_cli_export()
+    check_cli_unreadable_file()
+    check_dojo_links()
+
+
+def test_static_export():
+    """pytest からも実行できるようにする"""
+    run_all()
+    assert FAIL_COUNT == 0
+
+
+def main():
+    print("=" * 55)
+    print("  JBJJF 静的書き出しテスト")
+    print("=" * 55)
+
+    run_all()
+
+    # 結果サマリー
+    print("\n" + "=" * 55)
+    total = PASS_COUNT + FAIL_COUNT
+    print(f"  結果: {PASS_COUNT} PASS / {FAIL_COUNT} FAIL  (計{total}件)")
+    print("=" * 55)
+    return 1 if FAIL_COUNT > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+取得・ディスクキャッシュのテスト: スプレッドシートのサーバーを置き換えて、fetch_snapshot の状態遷移を確かめる
+
+実行方法:
+    python test_fetch.py
+"""
+
+import hashlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+import zlib
+from unittest import mock
+
+from jbjjf_timetable import fetch, snapshot
+from jbjjf_timetable.fetch import SnapshotRefresher, fetch_snapshot, new_fetch_state
+from jbjjf_timetable.metrics import METRICS
+from jbjjf_timetable.snapshot import workbook_content_hash
+from jbjjf_timetable.synthetic import make_workbook
+
+warnings.filterwarnings("ignore")
+
+# ──────────────────────────────────────────────
+# テストユーティリティ
+# ──────────────────────────────────────────────
+
+PASS_COUNT = 0
+FAIL_COUNT = 0
+
+def check(label, condition, detail=""):
+    global PASS_COUNT, FAIL_COUNT
+    if condition:
+        print(f"  ✅ PASS  {label}")
+        PASS_COUNT += 1
+    else:
+        print(f"  ❌ FAIL  {label}")
+        if detail:
+            print(f"           → {detail}")
+        FAIL_COUNT += 1
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeServer:
+    """公開スプレッドシートの代わり。ETag が一致すれば 304 を返す"""
+
+    def __init__(self):
+        self.version = 0
+        self.content = b""
+        self.requests = 0
+        self.last_headers = {}
+
+    def publish(self, content):
+        self.version += 1
+        self.content = content
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests += 1
+        self.last_headers = dict(headers or {})
+        etag = f'"v{self.version}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.content, {
+            "ETag": etag,
+            "Content-Disposition": "attachment; filename=\"テスト大会.xlsx\"",
+        })
+
+
+def workbook(seed):
+    return make_workbook(mats=2, dojos=10, entrants=20, width=20, seed=seed)
+
+# ──────────────────────────────────────────────
+# テスト定義
+# ──────────────────────────────────────────────
+
+def check_failed_parse_keeps_validators():
+    """F1: 解析に失敗した版の ETag を覚えず、次の取得で取り直す"""
+    print("\n[F1] 解析失敗後の再取得")
+    server = FakeServer()
+    server.publish(workbook(1))
+    state = new_fetch_state(cache_dir=tempfile.mkdtemp(), url="fake://sheet")
+    with mock.patch("requests.get", server.get):
+        v1 = fetch_snapshot(state)
+        check("初回の取得で版ができる", v1 is not None and len(v1.all_dojos) > 0)
+        check("変化がなければ 304 で前回の版を返す", fetch_snapshot(state) is v1)
+
+        server.publish(workbook(2))
+        with mock.patch.object(fetch, "parse_workbook", side_effect=ValueError("parse failed")):
+            try:
+                fetch_snapshot(state)
+                failed = False
+            except ValueError:
+                failed = True
+        check("解析の失敗は呼び出し元に伝わる", failed)
+        check("失敗した版の ETag は保存しない", state["etag"] == '"v1"', f"etag: {state['etag']}")
+
+        v2 = fetch_snapshot(state)
+        check("次の取得で新しい版を解析する", v2 is not v1 and v2.content_hash != v1.content_hash)
+        check("新しい版の ETag を保存する", state["etag"] == '"v2"', f"etag: {state['etag']}")
+        check("以降は 304 で新しい版を返す", fetch_snapshot(state) is v2)
+
+
+def check_publish_failure_counted():
+    """F2: 静的ファイルの書き出し (on_publish) の失敗を数え、表示用の版は更新する"""
+    print("\n[F2] 書き出し失敗の計数")
+    server = FakeServer()
+    server.publish(workbook(3))
+    state = new_fetch_state(cache_dir=tempfile.mkdtemp(), url="fake://sheet")
+
+    def failing_publish(snapshot):
+        raise OSError("disk full")
+
+    before = dict(METRICS._counters).get("publish_failures", 0)
+    refresher = SnapshotRefresher(state, on_publish=failing_publish)
+    with mock.patch("requests.get", server.get):
+        try:
+            snapshot = refresher.start().current()
+            deadline = time.perf_counter() + 10
+            while METRICS._counters.get("publish_failures", 0) == before and time.perf_counter() < deadline:
+                time.sleep(0.01)
+        finally:
+            refresher.stop()
+    check("止めたら更新スレッドが終わる", not refresher.thread.is_alive())
+    check("取得した版を表示に使う", len(snapshot.all_dojos) > 0)
+    check("書き出しの失敗を publish_failures に数える",
+          METRICS._counters.get("publish_failures", 0) == before + 1)
+    check("Prometheus の出力に含まれる", "jbjjf_publish_failures_total" in METRICS.render_prometheus())
+
+
+def check_cache_from_other_code_version():
+    """F3: 解析コードが変わったあとは、ディスクの版も ETag も使わずに解析し直す"""
+    print("\n[F3] 解析コードの版が違うディスクキャッシュ")
+    server = FakeServer()
+    server.publish(workbook(4))
+    cache_dir = tempfile.mkdtemp()
+    with mock.patch("requests.get", server.get):
+        v1 = fetch_snapshot(new_fetch_state(cache_dir=cache_dir, url="fake://sheet"))
+
+        state = new_fetch_state(cache_dir=cache_dir, url="fake://sheet")
+        check("同じコードなら保存した版から始める",
+              state["snapshot"] is not None and state["snapshot"].content_hash == v1.content_hash)
+        check("同じコードなら ETag も引き継ぐ", state["etag"] == '"v1"', f"etag: {state['etag']}")
+
+        with mock.patch.object(snapshot, "SNAPSHOT_CODE_VERSION", "0" * 16):
+            state = new_fetch_state(cache_dir=cache_dir, url="fake://sheet")
+            check("コードが違えば保存した版を使わない", state["snapshot"] is None)
+            check("コードが違えば ETag も使わない", state["etag"] is None and state["last_modified"] is None)
+            with mock.patch.object(fetch, "parse_workbook", wraps=fetch.parse_workbook) as parse:
+                v2 = fetch_snapshot(state)
+            check("条件なしで取得する", "If-None-Match" not in server.last_headers, f"{server.last_headers}")
+            check("本文が同じでも解析し直す", parse.call_count == 1 and v2.content_hash == v1.content_hash)
+
+
+def check_unloadable_pickle():
+    """F4: 別の版の pandas / numpy で保存した pickle など、読み込めない保存は使わずに取得し直す"""
+    print("\n[F4] 読み込めない pickle")
+    server = FakeServer()
+    server.publish(workbook(5))
+    planted = {
+        # 保存時にあったモジュール・クラスが今はない (ModuleNotFoundError / AttributeError)
+        "モジュールがない": b"\x80\x04cno_such_module\nFrame\n)\x81.",
+        "クラスがない": b"\x80\x04cpandas\nNoSuchFrame\n)\x81.",
+        # 復元時の引数が合わない (TypeError)
+        "引数が合わない": b"\x80\x04cbuiltins\nint\n(K\x01K\x02K\x03K\x04tR.",
+    }
+    with mock.patch("requests.get", server.get):
+        for label, data in planted.items():
+            cache_dir = tempfile.mkdtemp()
+            v1 = fetch_snapshot(new_fetch_state(cache_dir=cache_dir, url="fake://sheet"))
+            with open(os.path.join(cache_dir, f"{v1.content_hash}.pkl"), "wb") as f:
+                f.write(data)
+            try:
+                state = new_fetch_state(cache_dir=cache_dir, url="fake://sheet")
+            except Exception as e:
+                check(f"{label}: 例外を出さない", False, repr(e))
+                continue
+            check(f"{label}: 保存した版も ETag も使わない", state["snapshot"] is None and state["etag"] is None)
+            check(f"{label}: 取得し直せる", fetch_snapshot(state).content_hash == v1.content_hash)
+
+
+def crc_collision():
+    """CRC32 とサイズが同じで中身の違う2つのバイト列 (誕生日攻撃で数万回ほどで見つかる)"""
+    seen = {}
+    rng = random.Random(0)
+    while True:
+        data = rng.randbytes(8)
+        crc = zlib.crc32(data)
+        if crc in seen and seen[crc] != data:
+            return seen[crc], data
+        seen[crc] = data
+
+
+def zipped(parts, level=6):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as z:
+        for name, data in parts.items():
+            z.writestr(name, data)
+    return buf.getvalue()
+
+
+def check_content_hash():
+    """F5: ワークブックのハッシュはパートの中身で決まる (docProps/ と圧縮のしかたには左右されない)"""
+    print("\n[F5] ワークブックのハッシュ")
+    a, b = crc_collision()
+    base = {"xl/worksheets/sheet1.xml": a, "docProps/core.xml": b"2024-01-01"}
+    same = workbook_content_hash(zipped(base))
+    check("docProps/ だけ違えば同じ",
+          workbook_content_hash(zipped({**base, "docProps/core.xml": b"2025-12-31"})) == same)
+    check("圧縮のしかたが違っても同じ", workbook_content_hash(zipped(base, level=0)) == same)
+    check("CRC とサイズが同じでも中身が違えば別の版",
+          workbook_content_hash(zipped({**base, "xl/worksheets/sheet1.xml": b})) != same)
+    check("ZIP として読めなければ本文のハッシュ", workbook_content_hash(b"not a zip") == hashlib.sha256(b"not a zip").hexdigest())
+
+# ──────────────────────────────────────────────
+# メイン
+# ──────────────────────────────────────────────
+
+def run_all():
+    check_failed_parse_keeps_validators()
+    check_publish_failure_counted()
+    check_cache_from_other_code_version()
+    check_unloadable_pickle()
+    check_content_hash()
+
+
+def test_fetch_state_transitions():
+    """pytest からも実行できるようにする"""
+    run_all()
+    assert FAIL_COUNT == 0
+
+
+def main():
+    print("=" * 55)
+    print("  JBJJF 取得・キャッシュテスト")
+    print("=" * 55)
+
+    run_all()
+
+    # 結果サマリー
+    print("\n" + "=" * 55)
+    total = PASS_COUNT + FAIL_COUNT
+    print(f"  結果: {PASS_COUNT} PASS / {FAIL_COUNT} FAIL  (計{total}件)")
+    print("=" * 55)
+    return 1 if FAIL_COUNT > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+ゴールデン出力テスト: 保存済みの xlsx フィクスチャを実際の解析コード (jbjjf_timetable) にかけ、
+記録済みの道場一覧・試合表と比べる。あわせて段階ごとの処理時間が予算内かを確かめる
+
+実行方法:
+    python test_golden.py                       # 比較 + 時間予算のチェック
+    python test_golden.py --update              # 現在の出力でゴールデンを書き直す (解析結果を意図して変えたときだけ)
+    python test_golden.py --record FILE.xlsx NAME   # 実際の大会ファイルをフィクスチャとして追加する
+    python test_golden.py --generate            # 合成フィクスチャ (SYNTHETIC_FIXTURES) を作り直す
+
+フィクスチャ:
+    fixtures/golden/<NAME>.xlsx   入力
+    fixtures/golden/<NAME>.json   期待する出力 (道場一覧・試合表)
+    fixtures/golden/budgets.json  段階ごとの時間予算 [秒]。手で調整してよい (--update は未設定の分だけ足す)
+
+遅いマシンでは環境変数 GOLDEN_BUDGET_SCALE (例: 2) で予算をまとめて緩められる。
+"""
+
+import argparse
+import glob
+import importlib.util
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import time
+import warnings
+from unittest import mock
+
+from jbjjf_timetable import (
+    build_cell_index,
+    extract_all_dojos,
+    filter_schedule,
+    generate_full_html,
+    get_all_schedule_data,
+    get_schedule_data,
+    parse_grids_parallel,
+    parse_workbook,
+    read_workbook_grids,
+)
+from jbjjf_timetable.parallel import parse_sheets_parallel
+from jbjjf_timetable.synthetic import make_workbook
+
+warnings.filterwarnings("ignore")
+
+# ──────────────────────────────────────────────
+# 設定
+# ──────────────────────────────────────────────
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "golden")
+BUDGETS_PATH = os.path.join(FIXTURE_DIR, "budgets.json")
+MATCH_COLUMNS = ["dojo", "mat", "name", "match_no", "is_seed", "start_time", "category"]
+
+# --generate で作る合成フィクスチャ (レイアウトの揺れ・注記の多さ・列数を変えてある)
+SYNTHETIC_FIXTURES = {
+    "synthetic_small": dict(mats=2, dojos=12, entrants=40, width=25, seed=1),
+    "synthetic_medium": dict(mats=5, dojos=50, entrants=120, width=30, seed=2),
+    "synthetic_wide_noisy": dict(mats=3, dojos=30, entrants=80, width=60, seed=3, noise=0.3, bracket_size=(2, 12)),
+}
+
+# 予算を新しく決めるときの、計測値に対する倍率と下限 [秒]
+BUDGET_HEADROOM = 5.0
+BUDGET_FLOOR = 0.05
+BUDGET_SCALE = float(os.environ.get("GOLDEN_BUDGET_SCALE", "1"))
+TIMING_REPEAT = 3
+PARALLEL_WORKERS = 2
+PARALLEL_BAND_ROWS = 100  # 小さなフィクスチャでも行の帯への分割を通すため
+EDITED_DOJO = "差し替えテスト道場"
+
+# ──────────────────────────────────────────────
+# テストユーティリティ
+# ──────────────────────────────────────────────
+
+PASS_COUNT = 0
+FAIL_COUNT = 0
+
+def check(label, condition, detail=""):
+    global PASS_COUNT, FAIL_COUNT
+    if condition:
+        print(f"  ✅ PASS  {label}")
+        PASS_COUNT += 1
+    else:
+        print(f"  ❌ FAIL  {label}")
+        if detail:
+            print(f"           → {detail}")
+        FAIL_COUNT += 1
+
+
+def timed(func):
+    """func を TIMING_REPEAT 回実行し、(最短時間, 戻り値) を返す"""
+    best = math.inf
+    result = None
+    for _ in range(TIMING_REPEAT):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def available_readers():
+    readers = ["openpyxl", "pandas"]
+    if importlib.util.find_spec("python_calamine"):
+        readers.append("calamine")
+    return readers
+
+
+def fixture_names():
+    return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(FIXTURE_DIR, "*.xlsx")))
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, f"{name}.xlsx"), "rb") as f:
+        return f.read()
+
+
+def load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path, doc):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+
+# ──────────────────────────────────────────────
+# 解析と計測
+# ──────────────────────────────────────────────
+
+def run_stages(raw):
+    """実際の解析コードを段階ごとに実行し、(出力, {段階: 秒}) を返す"""
+    timings = {}
+    timings["read_grids"], grids = timed(lambda: read_workbook_grids(raw))
+    timings["extract_dojos"], dojos = timed(lambda: extract_all_dojos(grids))
+    timings["schedule_all"], table = timed(lambda: get_all_schedule_data(grids, dojos))
+    cell_index = build_cell_index(grids)
+    timings["schedule_each"], per_dojo = timed(
+        lambda: {dojo: get_schedule_data(grids, dojo, cell_index) for dojo in dojos}
+    )
+    timings["html_all"], _ = timed(
+        lambda: [generate_full_html(filter_schedule(table, dojo)) for dojo in dojos]
+    )
+    output = {
+        "sheets": list(grids),
+        "dojos": dojos,
+        "columns": MATCH_COLUMNS,
+        "matches": table[MATCH_COLUMNS].values.tolist(),
+    }
+    return output, timings, (grids, dojos, table, per_dojo)
+
+
+def edit_one_sheet(raw, dojos):
+    """(書き換え前, 2枚目のシートの道場名セルを1つ差し替えたもの, そのシート名) を返す
+
+    どちらも openpyxl で保存し直したものにして、書き換えたシート以外のセル値をそろえる
+    """
+    import openpyxl
+
+    def save(wb):
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+
+    wb = openpyxl.load_workbook(io.BytesIO(raw))
+    before = save(wb)
+    ws = wb.worksheets[min(1, len(wb.worksheets) - 1)]
+    for row in ws.iter_rows(max_col=20):
+        cell = next((c for c in row if c.value in dojos), None)
+        if cell is not None:
+            cell.value = EDITED_DOJO
+            break
+    return before, save(wb), ws.title
+
+
+def diff_matches(expected, actual):
+    """試合表の差分の要約 (欠落・余分の行と、順序だけの違いを区別する)"""
+    exp = [tuple(r) for r in expected]
+    act = [tuple(r) for r in actual]
+    if exp == act:
+        return ""
+    missing = [r for r in exp if r not in act]
+    extra = [r for r in act if r not in exp]
+    if not missing and not extra:
+        return "同じ行だが順序が異なる"
+    lines = [f"欠落 {len(missing)} 行 / 余分 {len(extra)} 行"]
+    lines += [f"  - {list(r)}" for r in missing[:3]]
+    lines += [f"  + {list(r)}" for r in extra[:3]]
+    return "\n             ".join(lines)
+
+# ──────────────────────────────────────────────
+# テスト定義
+# ──────────────────────────────────────────────
+
+def check_fixture(name, budgets):
+    """G1〜G6: 1つのフィクスチャについて出力と時間予算を確認する"""
+    print(f"\n[{name}]")
+    golden = load_json(os.path.join(FIXTURE_DIR, f"{name}.json"))
+    if golden is None:
+        check("ゴールデン出力がある", False, "--update で作成してください")
+        return
+    raw = read_fixture(name)
+    output, timings, (grids, dojos, table, per_dojo) = run_stages(raw)
+
+    # G1: 道場一覧・試合表がゴールデンと一致する
+    check("シート構成が一致する", output["sheets"] == golden["sheets"],
+          f"期待: {golden['sheets']} / 実際: {output['sheets']}")
+    missing = sorted(set(golden["dojos"]) - set(dojos))
+    extra = sorted(set(dojos) - set(golden["dojos"]))
+    check(f"道場一覧が一致する ({len(dojos)}件)", dojos == golden["dojos"],
+          f"欠落: {missing[:5]} / 余分: {extra[:5]}" if missing or extra else "並び順が異なる")
+    detail = diff_matches(golden["matches"], output["matches"])
+    check(f"試合表が一致する ({len(output['matches'])}行)", not detail, detail)
+
+    # G2: 道場ごとの get_schedule_data が全道場の表の絞り込みと一致する
+    mismatched = [
+        dojo for dojo in dojos
+        if per_dojo[dojo].values.tolist() != filter_schedule(table, dojo).values.tolist()
+    ]
+    check("道場別抽出と1パス抽出が一致する", not mismatched, f"不一致: {mismatched[:5]}")
+
+    # G3: どの読み込み方式でも同じ結果になる
+    for reader in available_readers():
+        other = read_workbook_grids(raw, reader=reader)
+        other_table = get_all_schedule_data(other, extract_all_dojos(other))
+        check(f"読み込み方式 {reader} でも試合表が一致する",
+              other_table[MATCH_COLUMNS].values.tolist() == output["matches"])
+
+    # G4: シートごとの並列解析でも道場一覧・試合表が同じ順序で一致する
+    par_grids, par_dojos, par_table = parse_grids_parallel(
+        raw, workers=PARALLEL_WORKERS, band_rows=PARALLEL_BAND_ROWS
+    )
+    check(f"並列解析 ({PARALLEL_WORKERS}プロセス) でも道場一覧・試合表が一致する",
+          list(par_grids) == output["sheets"] and par_dojos == dojos
+          and par_table[MATCH_COLUMNS].values.tolist() == output["matches"],
+          diff_matches(output["matches"], par_table[MATCH_COLUMNS].values.tolist()))
+
+    # G5: シートを1枚だけ書き換えた版を、前の版から差分で解析しても全体を解析し直した結果と一致する
+    before, after, edited = edit_one_sheet(raw, set(dojos))
+    previous = parse_workbook(before, "", "before", workers=1)
+    full = parse_workbook(after, "", "after", workers=1)
+    incremental = parse_workbook(after, "", "after", workers=1, previous=previous)
+    check("差分解析でも道場一覧・試合表が一致する",
+          incremental.all_dojos == full.all_dojos and incremental.schedule_table.equals(full.schedule_table),
+          diff_matches(full.schedule_table[MATCH_COLUMNS].values.tolist(),
+                       incremental.schedule_table[MATCH_COLUMNS].values.tolist()))
+    check(f"書き換えていないシートは解析し直さない (書き換え: {edited})",
+          all(incremental.grids[name] is previous.grids[name] for name in previous.grids if name != edited)
+          and incremental.grids[edited] is not previous.grids[edited])
+    with mock.patch("jbjjf_timetable.snapshot.parse_sheets_parallel", wraps=parse_sheets_parallel) as par:
+        par_incremental = parse_workbook(after, "", "after", workers=PARALLEL_WORKERS, previous=previous)
+    check(f"並列 ({PARALLEL_WORKERS}プロセス) の差分解析でも一致し、書き換えたシートだけ解析し直す",
+          par.called and par_incremental.all_dojos == full.all_dojos and par_incremental.schedule_table.equals(full.schedule_table)
+          and all(par_incremental.grids[name] is previous.grids[name] for name in previous.grids if name != edited)
+          and par_incremental.grids[edited] is not previous.grids[edited])
+    changed = {
+        dojo for dojo in set(full.all_dojos) | set(previous.all_dojos)
+        if filter_schedule(full.schedule_table, dojo).values.tolist()
+        != filter_schedule(previous.schedule_table, dojo).values.tolist()
+    }
+    bumped = {
+        dojo for dojo in set(full.all_dojos) | set(previous.all_dojos)
+        if incremental.dojo_versions.get(dojo) != previous.dojo_versions.get(dojo)
+    }
+    check(f"試合行が変わった道場だけ版が変わる ({len(bumped)}/{len(full.all_dojos)}道場)",
+          bumped == changed and EDITED_DOJO in bumped, f"変化: {sorted(changed)} / 版の更新: {sorted(bumped)}")
+
+    # G6: 段階ごとの時間予算
+    for stage, seconds in timings.items():
+        budget = budgets.get(name, {}).get(stage)
+        if budget is None:
+            print(f"  ⚠️  SKIP  {stage}: 予算未設定 ({seconds * 1000:.1f}ms)")
+            continue
+        budget *= BUDGET_SCALE
+        check(f"{stage}: {seconds * 1000:.1f}ms ≤ 予算 {budget * 1000:.0f}ms", seconds <= budget)
+
+# ──────────────────────────────────────────────
+# フィクスチャの作成・更新
+# ──────────────────────────────────────────────
+
+def update_fixture(name, budgets):
+    """現在の出力でゴールデンを書き直し、未設定の予算を計測値から決める"""
+    output, timings, _ = run_stages(read_fixture(name))
+    previous = load_json(os.path.join(FIXTURE_DIR, f"{name}.json"), {})
+    meta = {"source": previous.get("source", "recorded")}
+    if "params" in previous:
+        meta["params"] = previous["params"]
+    write_json(os.path.join(FIXTURE_DIR, f"{name}.json"), {**meta, **output})
+    fixture_budgets = budgets.setdefault(name, {})
+    for stage, seconds in timings.items():
+        if stage not in fixture_budgets:
+            fixture_budgets[stage] = round(max(seconds * BUDGET_HEADROOM, BUDGET_FLOOR), 3)
+    print(f"  → {name}: 道場 {len(output['dojos'])} / 試合行 {len(output['matches'])}")
+
+
+def generate_synthetic():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for name, params in SYNTHETIC_FIXTURES.items():
+        with open(os.path.join(FIXTURE_DIR, f"{name}.xlsx"), "wb") as f:
+            f.write(make_workbook(**params))
+        write_json(os.path.join(FIXTURE_DIR, f"{name}.json"), {"source": "synthetic", "params": params})
+        print(f"  → {name}.xlsx を生成")
+
+# ──────────────────────────────────────────────
+# メイン
+# ──────────────────────────────────────────────
+
+def run_all():
+    budgets = load_json(BUDGETS_PATH, {})
+    names = fixture_names()
+    check("フィクスチャが1件以上ある", len(names) >= 1, f"{FIXTURE_DIR} に xlsx がありません")
+    for name in names:
+        check_fixture(name, budgets)
+
+
+def test_golden_fixtures():
+    """pytest からも実行できるようにする"""
+    run_all()
+    assert FAIL_COUNT == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="保存済みフィクスチャで解析結果と処理時間を確認する")
+    parser.add_argument("--update", action="store_true", help="現在の出力でゴールデンを書き直す")
+    parser.add_argument("--record", nargs=2, metavar=("XLSX", "NAME"), help="xlsx をフィクスチャとして追加する")
+    parser.add_argument("--generate", action="store_true", help="合成フィクスチャを作り直す (ゴールデンも更新)")
+    args = parser.parse_args(argv)
+
+    print("=" * 55)
+    print("  JBJJF ゴールデン出力テスト")
+    print("=" * 55)
+
+    if args.generate or args.record or args.update:
+        os.makedirs(FIXTURE_DIR, exist_ok=True)
+        names = fixture_names()
+        if args.generate:
+            print("\n[準備] 合成フィクスチャを生成中...")
+            generate_synthetic()
+            names = sorted(set(names) | set(SYNTHETIC_FIXTURES))
+        if args.record:
+            src, name = args.record
+            shutil.copyfile(src, os.path.join(FIXTURE_DIR, f"{name}.xlsx"))
+            names = [name]
+        print("\n[更新] ゴールデン出力を書き出し中...")
+        budgets = load_json(BUDGETS_PATH, {})
+        for name in names:
+            update_fixture(name, budgets)
+        write_json(BUDGETS_PATH, budgets)
+        return 0
+
+    run_all()
+
+    # 結果サマリー
+    print("\n" + "=" * 55)
+    total = PASS_COUNT + FAIL_COUNT
+    print(f"  結果: {PASS_COUNT} PASS / {FAIL_COUNT} FAIL  (計{total}件)")
+    print("=" * 55)
+    return 1 if FAIL_COUNT > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
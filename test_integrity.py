@@ -13,10 +13,20 @@ import sys
 import re
 import io
 import warnings
-import unicodedata
 import requests
 import pandas as pd
 
+# テスト対象: アプリと同じ解析コード
+from jbjjf_timetable.parser import (
+    extract_all_dojos,
+    extract_time_from_line,
+    get_all_schedule_data,
+    get_mat_num,
+    get_schedule_data,
+    has_time_pattern,
+    read_workbook_grids,
+)
+
 warnings.filterwarnings("ignore")
 
 # ──────────────────────────────────────────────
@@ -29,88 +39,6 @@ SPS_URL = (
     "/pub?output=xlsx"
 )
 
-# ──────────────────────────────────────────────
-# app.py からコピーしたパース関数（テスト対象）
-# ──────────────────────────────────────────────
-
-def clean_val(v):
-    return re.sub(r"\.0$", "", str(v).strip())
-
-def is_valid_id(text):
-    text = clean_val(text)
-    if text in ["1", "nan", "", "-", "No", "•", "Result"]:
-        return False
-    if re.match(r"^\d+-\d+$", text):
-        return True
-    if text.isdigit() and int(text) < 999:
-        return True
-    return False
-
-def has_time_pattern(text):
-    return bool(re.search(r"\d{1,2}:\d{2}", str(text)))
-
-def extract_time_from_line(line_txt):
-    times = re.findall(r"(\d{1,2}:\d{2})", line_txt)
-    return times[0] if times else "-"
-
-def is_likely_player(text):
-    has_jp = bool(re.search(r"[一-龥ぁ-んァ-ン]", text))
-    has_en = bool(re.search(r"[a-zA-Z]", text))
-    if not (has_jp and has_en):
-        return False
-    return bool(re.search(r"[一-龥ぁ-んァ-ン]+[ \u3000]+[a-zA-Z]", text))
-
-def is_likely_dojo(text):
-    EXCLUDE = {"集合時間", "計量", "試合開始", "Result", "優勝", "Winner",
-               "カテゴリー", "Mat", "マット", "道着チェック", "欠場"}
-    if text in EXCLUDE:
-        return False
-    if is_likely_player(text):
-        return False
-    return True
-
-def extract_all_dojos(sheets):
-    dojo_set = set()
-    for _, df in sheets.items():
-        df = df.fillna("").astype(str)
-        rows, cols = df.shape
-        for r in range(1, rows):
-            for c in range(min(20, cols)):
-                val = clean_val(df.iloc[r, c])
-                if len(val) < 2 or is_valid_id(val) or has_time_pattern(val):
-                    continue
-                if not is_likely_dojo(val):
-                    continue
-                upper_val = clean_val(df.iloc[r - 1, c])
-                if is_likely_player(upper_val):
-                    dojo_set.add(val)
-    return sorted(list(dojo_set))
-
-def get_schedule_data(sheets, target_dojo):
-    """app.py の get_schedule_data と同等の処理（簡略版）"""
-    results = []
-    for sheet_name, df in sheets.items():
-        df = df.fillna("").astype(str)
-        rows, cols = df.shape
-        search_cols = min(20, cols)
-        normalized_sheet = unicodedata.normalize("NFKC", str(sheet_name))
-        mat_match = re.search(r"(\d+)", normalized_sheet)
-        mat_num = mat_match.group(1) if mat_match else "999"
-
-        for r in range(rows):
-            for c in range(search_cols):
-                val = clean_val(df.iloc[r, c])
-                if val == target_dojo and r > 0:
-                    player_name = clean_val(df.iloc[r - 1, c])
-                    if player_name and player_name != "nan" and len(player_name) >= 2:
-                        results.append({
-                            "mat": mat_num,
-                            "dojo": target_dojo,
-                            "name": player_name,
-                        })
-                        break
-    return pd.DataFrame(results)
-
 # ──────────────────────────────────────────────
 # テストユーティリティ
 # ──────────────────────────────────────────────
@@ -173,10 +101,10 @@ def test_time_parse(sheets):
         print(f"           サンプル: {sorted(set(found_times))[:10]}")
 
 
-def test_dojo_extraction(sheets):
+def test_dojo_extraction(grids):
     """T3: 道場名の抽出"""
     print("\n[T3] 道場名抽出")
-    dojos = extract_all_dojos(sheets)
+    dojos = extract_all_dojos(grids)
     check("道場名が1件以上抽出される", len(dojos) >= 1,
           f"抽出数: {len(dojos)}")
     # キーワードが道場名として混入していないか
@@ -189,22 +117,35 @@ def test_dojo_extraction(sheets):
         print(f"           抽出された道場名 ({len(dojos)}件): {dojos[:10]}")
 
 
-def test_schedule_per_dojo(sheets):
+def test_schedule_per_dojo(grids):
     """T4: 各道場のスケジュールが取得できるか"""
     print("\n[T4] 道場別スケジュール取得")
-    dojos = extract_all_dojos(sheets)
+    dojos = extract_all_dojos(grids)
     if not dojos:
         check("道場名が存在する (前提)", False, "道場が0件のためスキップ")
         return
 
+    # 全道場分を1パスで抽出してから道場ごとに絞り込む
+    all_df = get_all_schedule_data(grids, dojos)
     total_entries = 0
     dojos_with_data = 0
     for dojo in dojos:
-        df = get_schedule_data(sheets, dojo)
+        df = all_df[all_df["dojo"] == dojo]
         if not df.empty:
             dojos_with_data += 1
             total_entries += len(df)
 
+    # 1パス抽出と道場別抽出の結果が一致するか（先頭数件で確認）
+    mismatched = []
+    for dojo in dojos[:5]:
+        single = get_schedule_data(grids, dojo)
+        names_all = all_df.loc[all_df["dojo"] == dojo, "name"].tolist()
+        names_single = single["name"].tolist() if not single.empty else []
+        if names_all != names_single:
+            mismatched.append(dojo)
+    check("1パス抽出と道場別抽出が一致する", len(mismatched) == 0,
+          f"不一致: {mismatched}")
+
     check("スケジュールが取得できた道場がある", dojos_with_data > 0,
           f"{dojos_with_data}/{len(dojos)} 道場にデータあり")
     check("スケジュールエントリが合計10件以上ある", total_entries >= 10,
@@ -212,13 +153,13 @@ def test_schedule_per_dojo(sheets):
     print(f"           合計エントリ: {total_entries} 件 / {dojos_with_data}/{len(dojos)} 道場")
 
 
-def test_no_garbage_names(sheets):
+def test_no_garbage_names(grids):
     """T5: 選手名にゴミデータが混入していないか"""
     print("\n[T5] 選手名サニティチェック")
-    dojos = extract_all_dojos(sheets)
+    dojos = extract_all_dojos(grids)
     all_names = []
     for dojo in dojos[:10]:  # 最大10道場で確認
-        df = get_schedule_data(sheets, dojo)
+        df = get_schedule_data(grids, dojo)
         if not df.empty:
             all_names.extend(df["name"].tolist())
 
@@ -243,10 +184,8 @@ def test_mat_numbers(sheets):
     """T6: マット番号がシート名から正しく抽出されるか"""
     print("\n[T6] マット番号抽出")
     for name in sheets.keys():
-        normalized = unicodedata.normalize("NFKC", str(name))
-        mat_match = re.search(r"(\d+)", normalized)
-        mat_num = mat_match.group(1) if mat_match else None
-        if mat_num:
+        mat_num = get_mat_num(name)
+        if mat_num != "999":
             check(f"シート '{name}' → マット番号 '{mat_num}'", mat_num.isdigit())
         else:
             print(f"  ⚠️  SKIP  シート '{name}' に数字なし（Otherとして扱われる）")
@@ -267,6 +206,7 @@ def main():
         resp = requests.get(SPS_URL, verify=False, timeout=30)
         resp.raise_for_status()
         sheets = pd.read_excel(io.BytesIO(resp.content), sheet_name=None, header=None)
+        grids = read_workbook_grids(resp.content)
         print(f"  → 取得成功 ({len(sheets)} シート: {list(sheets.keys())})")
     except Exception as e:
         print(f"  ❌ スプレッドシートの取得に失敗しました: {e}")
@@ -275,9 +215,9 @@ def main():
     # テスト実行
     test_fetch(sheets)
     test_time_parse(sheets)
-    test_dojo_extraction(sheets)
-    test_schedule_per_dojo(sheets)
-    test_no_garbage_names(sheets)
+    test_dojo_extraction(grids)
+    test_schedule_per_dojo(grids)
+    test_no_garbage_names(grids)
     test_mat_numbers(sheets)
 
     # 結果サマリー
@@ -0,0 +1,152 @@
+"""
+プロファイラのテスト: 計測はプロセスで同時に1つだけで、重なった処理は計測せずに実行する
+
+実行方法:
+    python test_profiling.py
+"""
+
+import cProfile
+import os
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+from jbjjf_timetable.profiling import Profile, finish_rerun_profile, profile_section, start_rerun_profile
+
+# ──────────────────────────────────────────────
+# テストユーティリティ
+# ──────────────────────────────────────────────
+
+PASS_COUNT = 0
+FAIL_COUNT = 0
+
+def check(label, condition, detail=""):
+    global PASS_COUNT, FAIL_COUNT
+    if condition:
+        print(f"  ✅ PASS  {label}")
+        PASS_COUNT += 1
+    else:
+        print(f"  ❌ FAIL  {label}")
+        if detail:
+            print(f"           → {detail}")
+        FAIL_COUNT += 1
+
+
+def samplers():
+    return [t for t in threading.enumerate() if t.name == "profile-sampler"]
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+# ──────────────────────────────────────────────
+# テスト定義
+# ──────────────────────────────────────────────
+
+def check_one_profile_at_a_time():
+    """P1: 計測中に当たった別の処理は計測せずに実行し、終われば次を計測できる"""
+    print("\n[P1] 同時に1つだけ計測する")
+    out_dir = tempfile.mkdtemp()
+    with profile_section("outer", forced=True, out_dir=out_dir) as outer:
+        busy()
+        with profile_section("inner", forced=True, out_dir=out_dir) as inner:
+            ran = busy()
+        results = {}
+
+        def other_thread():
+            results["rerun"] = start_rerun_profile("rerun", forced=True, out_dir=out_dir)
+            results["files"] = finish_rerun_profile()
+
+        t = threading.Thread(target=other_thread)
+        t.start()
+        t.join()
+    check("外側は計測する", outer is not None)
+    check("重なった処理は計測しない", inner is None)
+    check("計測しなくても処理は実行する", ran == busy())
+    check("別スレッドの再実行も計測しない", results["rerun"] is None and results["files"] == [])
+    check("重なった分のファイルは書き出さない",
+          len(os.listdir(out_dir)) == 2 and all("_outer." in f for f in os.listdir(out_dir)),
+          f"{os.listdir(out_dir)}")
+
+    with profile_section("after", forced=True, out_dir=out_dir) as after:
+        busy()
+    check("終わったあとは次を計測できる", after is not None)
+    check("採取スレッドが残らない", not samplers(), f"{samplers()}")
+
+
+def check_enable_failure():
+    """P2: cProfile を有効にできないとき (3.12 以降で別のプロファイラが動いている) は計測を諦める"""
+    print("\n[P2] cProfile を有効にできないとき")
+    out_dir = tempfile.mkdtemp()
+    error = ValueError("Another profiling tool is already active")
+    with mock.patch.object(cProfile.Profile, "enable", side_effect=error):
+        with profile_section("blocked", forced=True, out_dir=out_dir) as profile:
+            ran = busy()
+        rerun = start_rerun_profile("blocked_rerun", forced=True, out_dir=out_dir)
+        files = finish_rerun_profile()
+    check("処理は例外なく実行する", ran == busy())
+    check("計測しない", profile is None and rerun is None and files == [])
+    check("採取スレッドを起動しない", not samplers(), f"{samplers()}")
+    check("ファイルを書き出さない", os.listdir(out_dir) == [])
+
+    again = Profile("again", out_dir).start()
+    check("失敗のあとも計測できる", again is not None)
+    if again is not None:
+        again.stop(save=False)
+
+
+def check_abandoned_rerun():
+    """P3: 終了が呼ばれないまま終わった再実行 (st.rerun での打ち切りなど) の計測は、次の計測が引き継ぐ"""
+    print("\n[P3] 終了が呼ばれなかった計測")
+    out_dir = tempfile.mkdtemp()
+    started = {}
+
+    def interrupted_rerun():
+        started["profile"] = start_rerun_profile("interrupted", forced=True, out_dir=out_dir)
+        busy()  # finish_rerun_profile を呼ばずにスレッドが終わる
+
+    t = threading.Thread(target=interrupted_rerun)
+    t.start()
+    t.join()
+    check("前提: 打ち切られた再実行も計測は始まっていた", started["profile"] is not None)
+    with profile_section("next", forced=True, out_dir=out_dir) as profile:
+        busy()
+    check("スレッドが終わった計測は止めて、次を計測する", profile is not None)
+    check("打ち切られた計測は書き出さない", all("_next." in f for f in os.listdir(out_dir)), f"{os.listdir(out_dir)}")
+    check("あとから止めても何もしない", started["profile"].stop() == [])
+    check("採取スレッドが残らない", not samplers(), f"{samplers()}")
+
+# ──────────────────────────────────────────────
+# メイン
+# ──────────────────────────────────────────────
+
+def run_all():
+    check_one_profile_at_a_time()
+    check_enable_failure()
+    check_abandoned_rerun()
+
+
+def test_profiler():
+    """pytest からも実行できるようにする"""
+    run_all()
+    assert FAIL_COUNT == 0
+
+
+def main():
+    print("=" * 55)
+    print("  JBJJF プロファイラテスト")
+    print("=" * 55)
+
+    run_all()
+
+    # 結果サマリー
+    print("\n" + "=" * 55)
+    total = PASS_COUNT + FAIL_COUNT
+    print(f"  結果: {PASS_COUNT} PASS / {FAIL_COUNT} FAIL  (計{total}件)")
+    print("=" * 55)
+    return 1 if FAIL_COUNT > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
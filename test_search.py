@@ -0,0 +1,203 @@
+"""
+検索のテスト: 団体名・選手名の表記ゆれ (かな・ローマ字・全角/半角) と、選手の n-gram 索引
+
+実行方法:
+    python test_search.py
+"""
+
+import random
+import sys
+import warnings
+
+import pandas as pd
+
+from jbjjf_timetable.search import (
+    PLAYER_NGRAM,
+    _match_players,
+    build_dojo_search_index,
+    build_player_index,
+    canonical_romaji,
+    dojo_initial,
+    group_dojos_by_initial,
+    kana_to_romaji,
+    ngrams,
+    normalize_search_text,
+    search_dojos,
+    search_keys,
+    search_players,
+)
+
+warnings.filterwarnings("ignore")
+
+# ──────────────────────────────────────────────
+# テストユーティリティ
+# ──────────────────────────────────────────────
+
+PASS_COUNT = 0
+FAIL_COUNT = 0
+
+def check(label, condition, detail=""):
+    global PASS_COUNT, FAIL_COUNT
+    if condition:
+        print(f"  ✅ PASS  {label}")
+        PASS_COUNT += 1
+    else:
+        print(f"  ❌ FAIL  {label}")
+        if detail:
+            print(f"           → {detail}")
+        FAIL_COUNT += 1
+
+
+DOJOS = ["シュウ柔術", "しゅう道場", "SHUU GYM", "Syuu BJJ", "ネワザワールド", "ALLIANCE", "ハットリ道場", "がんばる柔術", "123 Club"]
+SHU_DOJOS = ["シュウ柔術", "しゅう道場", "SHUU GYM", "Syuu BJJ"]
+
+PLAYERS = [
+    ("高橋健", "ALLIANCE"), ("渡辺健二", "ALLIANCE"), ("ハットリ タロウ", "ハットリ道場"),
+    ("Sho Matsumoto", "SHUU GYM"), ("しょう まつもと", "しゅう道場"), ("うさとう", "ネワザワールド"),
+    ("松茶 マッチャ", "がんばる柔術"), ("高橋健", "ALLIANCE"),
+]
+
+def player_table():
+    return pd.DataFrame({"name": [n for n, _ in PLAYERS], "dojo": [d for _, d in PLAYERS]})
+
+
+def brute_force_players(table, query):
+    """索引を使わずに全選手の検索キーを確かめた結果 (行番号)"""
+    q_norm, q_romaji = search_keys(query)
+    hits = []
+    for i, name in enumerate(table["name"]):
+        keys = search_keys(name)
+        if any(q_norm in k for k in keys) or (q_romaji and any(q_romaji in k for k in keys)):
+            hits.append(i)
+    return hits
+
+# ──────────────────────────────────────────────
+# テスト定義
+# ──────────────────────────────────────────────
+
+def check_keys():
+    """S1: 検索キーの正規化とローマ字化"""
+    print("\n[S1] 検索キー")
+    check("カタカナはひらがなにそろえる", normalize_search_text("シュウ") == normalize_search_text("しゅう") == "しゅう")
+    check("半角カタカナも同じ", normalize_search_text("ｼｭｳ") == "しゅう")
+    check("全角英数字・大文字は半角小文字にそろえる", normalize_search_text("ＡＬＬＩＡＮＣＥ　ＢＪＪ") == "alliancebjj")
+    check("アクセントと記号を外す", normalize_search_text("Jiu-Jítsu・Club") == "jiujitsuclub")
+    check("しゅう → syuu", kana_to_romaji("しゅう") == "syuu", kana_to_romaji("しゅう"))
+    check("shu と syu は同じ綴りになる", canonical_romaji("shu") == canonical_romaji("syu") == "syu")
+    check("っ は次の子音を重ねる (はっとり → hattori)", kana_to_romaji("はっとり") == "hattori", kana_to_romaji("はっとり"))
+    check("っち と tch が同じ綴りになる (まっちゃ / matcha)",
+          canonical_romaji(kana_to_romaji("まっちゃ")) == canonical_romaji("matcha") == "mattya",
+          f"{canonical_romaji(kana_to_romaji('まっちゃ'))} / {canonical_romaji('matcha')}")
+    check("ヘボン式を訓令式に寄せる (chi・tsu・ji・fu)",
+          [canonical_romaji(w) for w in ("chiba", "tsuji", "fuji")] == ["tiba", "tuzi", "huzi"])
+
+
+def check_dojo_search():
+    """S2: 団体検索"""
+    print("\n[S2] 団体検索")
+    index = build_dojo_search_index(DOJOS)
+    for query in ("しゅう", "シュウ", "ｼｭｳ", "shu", "syu", "SHU", "ｓｈｕ"):
+        found = search_dojos(index, query)
+        check(f"「{query}」で しゅう/シュウ/SHUU/Syuu がそろって見つかる", found == SHU_DOJOS, f"{found}")
+    check("ひらがなでカタカナの団体が見つかる", search_dojos(index, "ねわざ") == ["ネワザワールド"])
+    check("全角の問い合わせで半角の団体が見つかる", search_dojos(index, "ＡＬＬＩ") == ["ALLIANCE"])
+    check("ローマ字で っ を含む団体が見つかる", search_dojos(index, "hattori") == ["ハットリ道場"])
+    check("空の問い合わせは全件 (元の並び順)", search_dojos(index, "  ") == DOJOS)
+    check("一致しなければ空", search_dojos(index, "zzz") == [])
+
+    check("頭文字: 英字・かなの行・数字",
+          [dojo_initial(d) for d in ("Syuu BJJ", "がんばる柔術", "ネワザワールド", "123 Club")] == ["S", "か", "な", "#"])
+    groups = group_dojos_by_initial(index)
+    check("頭文字グループは #・A〜Z・あ行〜わ行の順", list(groups) == ["#", "A", "S", "か", "さ", "な", "は"], f"{list(groups)}")
+
+
+def check_player_search():
+    """S3: 選手検索 (n-gram 索引)"""
+    print("\n[S3] 選手検索")
+    table = player_table()
+    index = build_player_index(table)
+
+    def names(query):
+        return list(search_players(index, table, query)["name"])
+
+    check("同じ選手の行をまとめて返す", names("高橋") == ["高橋健", "高橋健"])
+    check("1文字の問い合わせも部分一致で探す", names("健") == ["高橋健", "渡辺健二", "高橋健"], f"{names('健')}")
+    check("1文字のローマ字も探す (t)",
+          names("t") == list(table["name"].iloc[brute_force_players(table, "t")]) and len(names("t")) > 1,
+          f"{names('t')}")
+    check("ローマ字でかなの選手が見つかる (matsumoto → まつもと)",
+          names("matsumoto") == ["Sho Matsumoto", "しょう まつもと"], f"{names('matsumoto')}")
+    check("ヘボン式・訓令式どちらでも (syo)", names("syo") == ["Sho Matsumoto", "しょう まつもと"])
+    check("っ を含む名前をローマ字で (hattori)", names("hattori") == ["ハットリ タロウ"])
+    check("っち を含む名前をヘボン式で (matcha)", names("matcha") == ["松茶 マッチャ"], f"{names('matcha')}")
+    check("全角の問い合わせ", names("ＳＨＯ") == ["Sho Matsumoto", "しょう まつもと"])
+
+    # 「さとうさ」の bigram (さと・とう・うさ) はすべて「うさとう」にあるが、部分文字列ではない
+    query_key = normalize_search_text("さとうさ")
+    name_id = index.names.index("うさとう")
+    check("前提: 問い合わせの bigram がすべて同じ選手の索引にある",
+          all(name_id in index.grams.get(g, ()) for g in ngrams(query_key)))
+    check("bigram の候補でも部分一致しなければ返さない", _match_players(index, query_key) == set())
+    check("search_players も空", names("さとうさ") == [])
+    check("空の問い合わせは空", names("") == [])
+    check("件数の上限", len(search_players(index, table, "健", limit=2)) == 2)
+
+
+def check_index_matches_scan():
+    """S4: 索引を使った検索と、全選手を順に確かめた結果が同じ"""
+    print("\n[S4] 索引と全件走査の一致")
+    from jbjjf_timetable.parser import get_all_schedule_data, extract_all_dojos, read_workbook_grids
+    from jbjjf_timetable.synthetic import make_workbook
+
+    grids = read_workbook_grids(make_workbook(mats=3, dojos=20, entrants=60, width=20, seed=11))
+    table = get_all_schedule_data(grids, extract_all_dojos(grids))
+    index = build_player_index(table)
+    rng = random.Random(0)
+    queries = []
+    for name in rng.sample(sorted(set(table["name"])), 30):
+        norm, romaji = search_keys(name)
+        for key in (norm, romaji):
+            start = rng.randrange(len(key))
+            queries.append(key[start:start + rng.randint(1, PLAYER_NGRAM + 3)])
+    queries += ["zz", "ん", "山"]
+    mismatched = []
+    for q in queries:
+        expected = table.iloc[brute_force_players(table, q)].reset_index(drop=True)
+        if not search_players(index, table, q, limit=len(table)).equals(expected):
+            mismatched.append(q)
+    check(f"{len(queries)} 件の問い合わせで全件走査と一致", not mismatched, f"{mismatched[:5]}")
+
+# ──────────────────────────────────────────────
+# メイン
+# ──────────────────────────────────────────────
+
+def run_all():
+    check_keys()
+    check_dojo_search()
+    check_player_search()
+    check_index_matches_scan()
+
+
+def test_search():
+    """pytest からも実行できるようにする"""
+    run_all()
+    assert FAIL_COUNT == 0
+
+
+def main():
+    print("=" * 55)
+    print("  JBJJF 検索テスト")
+    print("=" * 55)
+
+    run_all()
+
+    # 結果サマリー
+    print("\n" + "=" * 55)
+    total = PASS_COUNT + FAIL_COUNT
+    print(f"  結果: {PASS_COUNT} PASS / {FAIL_COUNT} FAIL  (計{total}件)")
+    print("=" * 55)
+    return 1 if FAIL_COUNT > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())